@@ -0,0 +1,154 @@
+"""检查编译 typst 文档时其它处理函数能否及时响应
+
+编译的同时，每 1 ms 唤醒一次探针协程，记录事件循环被阻塞的时间（同`loop_latency`）。
+`blocking`模拟旧实现（在事件循环中调用`subprocess.run`），`async`为当前实现。
+若`async`时事件循环被阻塞超过`--max-lag`，以状态 1 退出。
+
+本仓库没有测试套件，此脚本即代替“编译时其它处理函数仍能响应”的测试，改动`typst.run`后应运行。
+
+默认编译一份较重的文档；若未安装 typst，或指定了`--fake SECONDS`，则改用假的 typst，
+它只等待指定秒数（默认`DEFAULT_FAKE_SECONDS`），再输出一页。
+
+用法（在 faq-bot 目录下）：
+
+    uv run python -m benchmarks.compile_latency [--executable typst] [--fake SECONDS]
+"""
+
+import argparse
+import asyncio
+import shutil
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+
+import nonebot
+
+nonebot.init(log_level="WARNING")
+
+from faq_bot.plugins.typst_compile import typst
+from faq_bot.plugins.typst_compile.typst import (
+    PREAMBLE_FIT_PAGE,
+    OkCompile,
+    typst_compile,
+)
+
+HEAVY_DOCUMENT = """
+#let fib(n) = if n < 2 { n } else { fib(n - 1) + fib(n - 2) }
+#fib(25)
+#for i in range(20) {
+  table(columns: 10, ..range(200).map(j => [#(i * j)]))
+}
+"""
+
+DEFAULT_FAKE_SECONDS = 0.5
+"""未安装 typst 时，假 typst 等待的秒数"""
+
+FAKE_TYPST = """#!{python}
+import sys, time
+sys.stdin.read()
+time.sleep({seconds})
+with open("1.png", "wb") as f:
+    f.write(b"\\x89PNG fake")
+"""
+
+
+@contextmanager
+def fake_typst(seconds: float) -> Iterator[str]:
+    """生成假的 typst 可执行文件"""
+    with TemporaryDirectory(prefix="fake-typst-") as directory:
+        executable = Path(directory) / "typst"
+        executable.write_text(FAKE_TYPST.format(python=sys.executable, seconds=seconds))
+        executable.chmod(0o755)
+        yield str(executable)
+
+
+@contextmanager
+def blocking_run() -> Iterator[None]:
+    """让`typst.run`在事件循环中直接调用`subprocess.run`，模拟旧实现"""
+    original = typst.run
+
+    async def run(args, *, cwd=None, input=None):
+        # 故意阻塞事件循环
+        return subprocess.run(  # noqa: ASYNC221
+            args, cwd=cwd, input=input, capture_output=True, text=True, check=False
+        )
+
+    typst.run = run
+    try:
+        yield
+    finally:
+        typst.run = original
+
+
+async def probe(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def measure(executable: str) -> tuple[float, list[float]]:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    result = await typst_compile(
+        HEAVY_DOCUMENT, executable=executable, preamble=PREAMBLE_FIT_PAGE
+    )
+    duration = time.perf_counter() - start
+    assert isinstance(result, OkCompile), result
+
+    stop.set()
+    await probe_task
+    return duration, lags
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--executable", default="typst", help="typst executable")
+    parser.add_argument(
+        "--fake", type=float, metavar="SECONDS", help="use a fake typst instead"
+    )
+    parser.add_argument(
+        "--max-lag",
+        type=float,
+        default=0.1,
+        help="fail if the event loop is blocked longer than this (seconds)",
+    )
+    args = parser.parse_args()
+
+    if args.fake is None and shutil.which(args.executable) is None:
+        print(f"{args.executable} is not found. Using a fake typst instead.")
+        args.fake = DEFAULT_FAKE_SECONDS
+
+    with (
+        fake_typst(args.fake) if args.fake is not None else nullcontext(args.executable)
+    ) as executable:
+        results: dict[str, tuple[float, list[float]]] = {}
+        for mode, context in [("blocking", blocking_run()), ("async", nullcontext())]:
+            with context:
+                results[mode] = await measure(executable)
+
+            duration, lags = results[mode]
+            print(
+                f"{mode:>8}: compile {duration * 1e3:7.1f} ms, "
+                f"loop blocked max {max(lags) * 1e3:7.1f} ms, "
+                f"median {median(lags) * 1e3:5.2f} ms, "
+                f"{len(lags)} wake-ups"
+            )
+
+    _, lags = results["async"]
+    if max(lags) > args.max_lag:
+        print(f"The event loop was blocked for over {args.max_lag} s.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
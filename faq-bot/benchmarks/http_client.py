@@ -0,0 +1,62 @@
+"""比较每次新建客户端与共享客户端的 VitePress 索引发现耗时
+
+VitePress 索引需要依次请求四个文件（HTML → theme → VPLocalSearchBox → @localSearchIndexroot），
+每次新建客户端时都要重新建立 TCP/TLS 连接。
+
+用法（在 faq-bot 目录下）：
+
+    uv run python -m benchmarks.http_client [--base-url URL] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import time
+from statistics import mean, median
+
+from faq_bot.shared import http
+from faq_bot.shared.search.by.minisearch_index import (
+    discover_search_index_url,
+    fetch_search_index,
+    find_theme_url,
+)
+
+
+async def measure(base_url: str, rounds: int, *, shared: bool) -> list[float]:
+    durations: list[float] = []
+    for _ in range(rounds):
+        if not shared:
+            # 模拟旧实现：每次获取都用新的客户端
+            await http.close_client()
+
+        start = time.perf_counter()
+        # 完整的发现过程，不使用上次找到的 URL
+        theme_url = await find_theme_url(base_url, conditional=False)
+        assert theme_url is not None
+        await fetch_search_index(await discover_search_index_url(base_url, theme_url))
+        durations.append(time.perf_counter() - start)
+
+    await http.close_client()
+    return durations
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="https://typst-doc-cn.github.io/guide")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    # 预热 DNS 等，不计入结果
+    await measure(args.base_url, 1, shared=True)
+
+    for shared in [False, True]:
+        durations = await measure(args.base_url, args.rounds, shared=shared)
+        label = "shared client" if shared else "new client per fetch"
+        print(
+            f"{label:>20}: mean {mean(durations) * 1e3:7.1f} ms, "
+            f"median {median(durations) * 1e3:7.1f} ms "
+            f"({args.rounds} rounds, 4 requests each)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
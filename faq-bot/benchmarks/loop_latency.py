@@ -0,0 +1,204 @@
+"""测量冷启动加载索引时事件循环被阻塞的时间
+
+用合成的 search.json（typst 官方文档）、searchindex.json（mdBook）与 index.json（包注册表）代替网络，
+在加载的同时每 1 ms 唤醒一次探针协程，记录其延迟。
+`inline`模拟旧实现（在事件循环中解析、建立索引），`thread`为当前实现。
+
+用法（在 faq-bot 目录下）：
+
+    uv run python -m benchmarks.loop_latency [--scale N]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from statistics import median
+
+import httpx
+import nonebot
+
+nonebot.init()
+
+from faq_bot.plugins.typst_compile.preprocess import load_registry
+from faq_bot.plugins.typst_doc.by_official_docs import (
+    get_entries as get_official_docs,
+)
+from faq_bot.shared import http
+from faq_bot.shared.search.by.mdbook_index import (
+    get_entries as get_mdbook,
+)
+
+WORDS = [
+    "table",
+    "grid",
+    "cell",
+    "text",
+    "font",
+    "page",
+    "math",
+    "equation",
+    "figure",
+    "image",
+    "raw",
+    "list",
+    "heading",
+    "par",
+    "block",
+    "box",
+    "stack",
+    "align",
+    "place",
+    "表格",
+    "字体",
+    "页面",
+    "公式",
+    "图片",
+    "代码",
+    "列表",
+    "标题",
+    "目录",
+    "段落",
+    "缩进",
+    "间距",
+]
+
+
+def title() -> str:
+    return " ".join(random.choice(WORDS) for _ in range(random.randint(1, 4)))
+
+
+def official_docs(n: int) -> bytes:
+    items = [
+        {
+            "kind": random.choice(["Chapter", "Function", "Type", "Parameter of text"]),
+            "title": title(),
+            "route": f"/docs/reference/{random.choice(WORDS)}/{i}/",
+            "content": " ".join(random.choices(WORDS, k=30)),
+        }
+        for i in range(n)
+    ]
+    return json.dumps({"items": items}).encode()
+
+
+def mdbook(n: int) -> bytes:
+    docs = {
+        str(i): {
+            "id": str(i),
+            "title": title(),
+            "breadcrumbs": f"{title()} » {title()}",
+        }
+        for i in range(n)
+    }
+    return json.dumps(
+        {
+            "doc_urls": [f"/chapter{i}.html" for i in range(n)],
+            "index": {"documentStore": {"length": n, "docs": docs}},
+        }
+    ).encode()
+
+
+def registry(n: int) -> bytes:
+    records = [
+        {
+            "name": f"package-{i // 5}",
+            "version": f"0.{i % 5}.0",
+            "entrypoint": "lib.typ",
+            "authors": ["Someone"],
+            "license": "MIT",
+            "description": " ".join(random.choices(WORDS, k=20)),
+            "keywords": random.choices(WORDS, k=5),
+            "categories": ["utility"],
+            "size": 12345,
+            "readme": "README.md",
+        }
+        for i in range(n)
+    ]
+    return json.dumps(records).encode()
+
+
+@contextmanager
+def inline_to_thread():
+    """让`asyncio.to_thread`直接在事件循环中运行，模拟旧实现"""
+    original = asyncio.to_thread
+
+    async def to_thread(fn, /, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    asyncio.to_thread = to_thread
+    try:
+        yield
+    finally:
+        asyncio.to_thread = original
+
+
+async def probe(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def measure(load: Callable[[], Awaitable[object]]) -> tuple[float, list[float]]:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    await load()
+    duration = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    return duration, lags
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="payload size multiplier")
+    args = parser.parse_args()
+
+    random.seed(42)
+    payloads = {
+        "/assets/search.json": official_docs(5000 * args.scale),
+        "/searchindex.json": mdbook(1000 * args.scale),
+        "/preview/index.json": registry(5000 * args.scale),
+    }
+    http._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=payloads[request.url.path])
+        )
+    )
+    for path, content in payloads.items():
+        print(f"{path}: {len(content) / 1e6:.1f} MB")
+
+    # 绕过缓存，每次都重新获取
+    loads: dict[str, Callable[[], Awaitable[object]]] = {
+        "official docs": lambda: get_official_docs.__wrapped__("https://typst.app"),
+        "mdbook": lambda: get_mdbook.__wrapped__("https://example.org"),
+        "registry": lambda: load_registry.__wrapped__(),
+    }
+
+    for label, load in loads.items():
+        for mode in ["inline", "thread"]:
+            if mode == "inline":
+                with inline_to_thread():
+                    duration, lags = await measure(load)
+            else:
+                duration, lags = await measure(load)
+            print(
+                f"{label:>13} ({mode:>6}): load {duration * 1e3:6.1f} ms, "
+                f"loop blocked max {max(lags) * 1e3:6.1f} ms, "
+                f"median {median(lags) * 1e3:5.2f} ms, "
+                f"total {sum(lags) * 1e3:6.1f} ms"
+            )
+
+    await http.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
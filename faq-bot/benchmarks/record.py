@@ -0,0 +1,50 @@
+"""录制各网站的索引文件，供`benchmarks.search`使用
+
+按正常方式加载各索引，同时把收到的每个响应保存到`benchmarks/fixtures/<主机名>/<路径>`，
+因此录下的正是程序实际请求的文件。路径以`/`结尾或没有扩展名的保存为其中的`index.html`。
+
+用法（在 faq-bot 目录下，需联网）：
+
+    uv run python -m benchmarks.record
+"""
+
+import asyncio
+from pathlib import PurePosixPath
+
+import httpx
+import nonebot
+
+nonebot.init(log_level="WARNING")
+
+from benchmarks.search import BACKENDS, FIXTURES
+from faq_bot.shared import http
+
+
+async def save(response: httpx.Response) -> None:
+    if response.status_code != 200:
+        return
+    await response.aread()
+
+    path = PurePosixPath(response.url.path)
+    if response.url.path.endswith("/") or not path.suffix:
+        path /= "index.html"
+    file = FIXTURES / response.url.host / path.relative_to("/")
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_bytes(response.content)
+    print(f"{response.url} → {file}")
+
+
+async def main() -> None:
+    client = http.get_client()
+    client.event_hooks["response"].append(save)
+
+    for backend in BACKENDS:
+        print(f"# {backend.name}")
+        await backend.cold(backend.base_url)
+
+    await http.close_client()
+    print(f"Saved to {FIXTURES.resolve()}.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
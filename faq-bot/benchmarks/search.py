@@ -0,0 +1,480 @@
+"""搜索的基准测试
+
+每个网站用一个本地 HTTP 服务器代替，测量各搜索方法的
+- `cold`：冷启动加载（下载、解析、建立索引），不经缓存
+- `parse`：解析已下载的文件
+- `peak`：解析时（含读取文件）的内存峰值
+- `build`：建立索引
+- `query`：单次搜索，中位数
+以及按`/search`、`/tyd`配置的`build_handler`单次回复（`handler`，中位数，不缓存回复）。
+
+网站文件默认使用`benchmarks/fixtures/`中录制的真实文件（见`benchmarks.record`），若未录制则合成；
+`--scale`按倍数合成更大的索引（如 10、100）。
+
+结果与`benchmarks/baseline.json`比较，若任一项超过基准的`--tolerance`倍，以状态 1 退出。
+基准与机器有关，更换机器或有意改变性能后，用`--save-baseline`重新记录。
+
+用法（在 faq-bot 目录下）：
+
+    uv run python -m benchmarks.search [--fixtures auto|recorded|synthetic] [--scale 1 10 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from statistics import median
+
+import httpx
+import nonebot
+
+# 快照写到临时目录，以免与正式运行的快照混淆
+os.environ["FAQ_BOT_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="faq-bot-bench-")
+nonebot.init(log_level="WARNING")
+
+from benchmarks import synthetic
+from faq_bot.plugins.typst_compile.preprocess import parse_registry
+from faq_bot.plugins.typst_doc import by_official_docs
+from faq_bot.shared import http
+from faq_bot.shared.search.by import (
+    SearchFn,
+    SuggestFn,
+    mdbook_index,
+    minisearch_index,
+    sitemap_content,
+    sitemap_html,
+)
+from faq_bot.shared.search.handle import build_handler
+from faq_bot.shared.search.index import build_index
+from faq_bot.shared.search.rank import top_k
+from faq_bot.shared.search.tokenize import tokenize
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BASELINE = Path(__file__).parent / "baseline.json"
+
+QUERIES = [
+    "table",
+    "font",
+    "page numbering",
+    "grid cell",
+    "text font size",
+    "表格",
+    "字体",
+    "生僻字怎么办",
+    "参考文献 格式",
+    "heading outline",
+    "equation",
+    "grid.c",  # 函数路径的前缀
+    "mathh",  # 拼写错误，触发纠正
+    "no-such-thing-anywhere",
+]
+
+
+@dataclass
+class Backend:
+    name: str
+    base_url: str
+    """真实网站的 base URL"""
+    cold: Callable[[str], Awaitable[object]]
+    """本地 base URL ↦ 索引"""
+    parse: Callable[[Path, str], object]
+    """(网站目录, 本地 base URL) ↦ 条目"""
+    build: Callable[[object], object] | None = None
+    """条目 ↦ 索引"""
+    search: SearchFn | None = None
+
+
+def read(site: Path, pattern: str) -> str:
+    (path,) = site.glob(pattern)
+    return path.read_text(encoding="utf-8")
+
+
+def parse_minisearch(site: Path, base: str) -> tuple[str, dict]:
+    index = minisearch_index.parse_search_index_js(
+        read(site, "**/assets/chunks/@localSearchIndexroot.*.js")
+    )
+    return base, index
+
+
+def build_minisearch(parsed: tuple[str, dict]) -> object:
+    return minisearch_index.build_search_index(*parsed, None)
+
+
+def parse_sitemap(site: Path, base: str) -> list[sitemap_html.Entry]:
+    return [
+        sitemap_html.Entry(url=url, title=title)
+        for url, title in sitemap_html.parse_sitemap_html(read(site, "sitemap.html"))
+    ]
+
+
+def parse_content(site: Path, base: str) -> list[sitemap_content.Entry]:
+    return [
+        sitemap_content.Entry(
+            url=e.url,
+            title=e.title,
+            text=sitemap_content.extract_text(
+                (site / e.url.lstrip("/")).read_text(encoding="utf-8")
+            ),
+        )
+        for e in parse_sitemap(site, base)
+    ]
+
+
+async def load_registry(base: str) -> dict[str, str]:
+    """同`preprocess.load_registry`，但使用本地 URL"""
+    response = await http.get_if_modified(f"{base}/preview/index.json")
+    return await asyncio.to_thread(parse_registry, response.content)
+
+
+def build(entries: object) -> object:
+    return build_index(entries, None)
+
+
+BACKENDS = [
+    Backend(
+        "sitemap_html",
+        "https://bithesis.bitnp.net",
+        sitemap_html.get_entries.__wrapped__,
+        parse_sitemap,
+        build,
+        sitemap_html.search,
+    ),
+    Backend(
+        "minisearch (bithesis)",
+        "https://bithesis.bitnp.net",
+        minisearch_index.get_entries.__wrapped__,
+        parse_minisearch,
+        build_minisearch,
+        minisearch_index.search,
+    ),
+    Backend(
+        "sitemap_content",
+        "https://bithesis.bitnp.net",
+        sitemap_content.get_entries.__wrapped__,
+        parse_content,
+        sitemap_content.ContentIndex,
+        sitemap_content.search,
+    ),
+    Backend(
+        "minisearch (guide)",
+        "https://typst-doc-cn.github.io/guide",
+        minisearch_index.get_entries.__wrapped__,
+        parse_minisearch,
+        build_minisearch,
+        minisearch_index.search,
+    ),
+    Backend(
+        "official_docs",
+        "https://typst.app",
+        by_official_docs.get_entries.__wrapped__,
+        lambda site, base: by_official_docs.parse_search(
+            read(site, "assets/search.json")
+        ),
+        by_official_docs.OfficialDocsIndex,
+        by_official_docs.search,
+    ),
+    Backend(
+        "mdbook",
+        "https://sitandr.github.io/typst-examples-book/book",
+        mdbook_index.get_entries.__wrapped__,
+        lambda site, base: list(
+            mdbook_index.parse_search_index(
+                mdbook_index.load_search_index(read(site, "**/searchindex.json"))
+            )
+        ),
+        build,
+        mdbook_index.search,
+    ),
+    Backend(
+        "registry",
+        "https://packages.typst.org",
+        load_registry,
+        lambda site, base: parse_registry((site / "preview/index.json").read_bytes()),
+    ),
+]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@contextmanager
+def serve(root: Path) -> Iterator[dict[str, str]]:
+    """为`root`下的每个网站目录启动一个本地 HTTP 服务器，返回 主机名 ↦ 本地 origin"""
+    servers: list[ThreadingHTTPServer] = []
+    try:
+        origins: dict[str, str] = {}
+        for site in sorted(p for p in root.iterdir() if p.is_dir()):
+            server = ThreadingHTTPServer(
+                ("127.0.0.1", 0), partial(QuietHandler, directory=site)
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+            origins[site.name] = f"http://127.0.0.1:{server.server_port}"
+        yield origins
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+def local(base_url: str, origins: dict[str, str]) -> str:
+    """真实网站的 base URL ↦ 本地 base URL"""
+    url = httpx.URL(base_url)
+    return origins[url.host] + url.path.removesuffix("/")
+
+
+async def timed(fn: Callable[[], Awaitable[object]], rounds: int) -> float:
+    durations: list[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn()
+        durations.append(time.perf_counter() - start)
+    return median(durations)
+
+
+def timed_sync(fn: Callable[[], object], rounds: int) -> tuple[float, object]:
+    durations: list[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return median(durations), result
+
+
+async def measure_backend(
+    backend: Backend, root: Path, origins: dict[str, str], rounds: int
+) -> dict[str, float]:
+    site = root / httpx.URL(backend.base_url).host
+    base = local(backend.base_url, origins)
+
+    result = {"cold": await timed(lambda: backend.cold(base), rounds)}
+    result["parse"], entries = timed_sync(lambda: backend.parse(site, base), rounds)
+
+    # 另行测量内存，因为 tracemalloc 会拖慢解析
+    tracemalloc.start()
+    backend.parse(site, base)
+    result["peak"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if backend.build is not None:
+        build = backend.build
+        result["build"], index = timed_sync(lambda: build(entries), rounds)
+
+        if backend.search is not None:
+            # 直接查询已建立的索引，不经缓存
+            durations: list[float] = []
+            for q in QUERIES:
+                keywords = tokenize(q)
+                for _ in range(rounds * 10):
+                    start = time.perf_counter()
+                    top_k(index.search(keywords), keywords, 5)
+                    durations.append(time.perf_counter() - start)
+            result["query"] = median(durations)
+
+    return result
+
+
+def redirect(fn: Callable, base: str) -> Callable:
+    """让搜索或纠正拼写的方法忽略传入的 base URL，改用本地的`base`
+
+    `build_handler`要求 https，而本地服务器只有 http。
+    """
+
+    async def wrapper(_base_url: str, keywords: list[str]):
+        return await fn(base, keywords)
+
+    wrapper.__module__ = fn.__module__
+    return wrapper
+
+
+async def measure_handlers(origins: dict[str, str], rounds: int) -> dict[str, float]:
+    configs: dict[str, tuple[list[str], list[SearchFn], list[SuggestFn], str]] = {
+        "handler /search": (
+            ["https://bithesis.bitnp.net"] * 3,
+            [sitemap_html.search, minisearch_index.search, sitemap_content.search],
+            [sitemap_html.suggest, minisearch_index.suggest, sitemap_content.suggest],
+            "concurrent",
+        ),
+        "handler /tyd": (
+            [
+                "https://typst-doc-cn.github.io/guide",
+                "https://typst.app",
+                "https://sitandr.github.io/typst-examples-book/book",
+            ],
+            [minisearch_index.search, by_official_docs.search, mdbook_index.search],
+            [
+                minisearch_index.suggest,
+                by_official_docs.suggest,
+                mdbook_index.suggest,
+            ],
+            "merged",
+        ),
+    }
+
+    result: dict[str, float] = {}
+    for name, (bases, methods, suggest_methods, mode) in configs.items():
+        locals_ = [local(b, origins) for b in bases]
+        # 先加载索引，之后只测量回复
+        for b, search in zip(locals_, methods):
+            await search(b, [])
+
+        handler = build_handler(
+            base_url=bases,
+            methods=[redirect(m, b) for m, b in zip(methods, locals_)],
+            suggest_methods=[redirect(m, b) for m, b in zip(suggest_methods, locals_)],
+            if_no_result="未找到结果。",
+            mode=mode,
+            reply_cache_size=0,
+        )
+        durations: list[float] = []
+        for q in QUERIES:
+            for _ in range(rounds * 3):
+                start = time.perf_counter()
+                await handler(q)
+                durations.append(time.perf_counter() - start)
+        result[name] = median(durations)
+    return result
+
+
+async def run(root: Path, rounds: int) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    with serve(root) as origins:
+        for backend in BACKENDS:
+            results[backend.name] = await measure_backend(
+                backend, root, origins, rounds
+            )
+            print(
+                f"{backend.name:>22}: "
+                + ", ".join(
+                    f"{k} {format_metric(k, v)}"
+                    for k, v in results[backend.name].items()
+                ),
+                flush=True,
+            )
+        for name, duration in (await measure_handlers(origins, rounds)).items():
+            results[name] = {"reply": duration}
+            print(f"{name:>22}: reply {format_metric('reply', duration)}", flush=True)
+    return results
+
+
+def format_metric(metric: str, value: float) -> str:
+    if metric == "peak":
+        return f"{value / 1e6:.1f} MB"
+
+    seconds = value
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds * 1e6:.0f} µs"
+
+
+def compare(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    tolerance: float,
+) -> list[str]:
+    """返回超过基准`tolerance`倍的各项"""
+    regressions: list[str] = []
+    for run_name, backends in results.items():
+        for backend, metrics in backends.items():
+            for metric, value in metrics.items():
+                reference = baseline.get(run_name, {}).get(backend, {}).get(metric)
+                if reference is None:
+                    continue
+                if value > reference * tolerance:
+                    regressions.append(
+                        f"{run_name} / {backend} / {metric}: "
+                        f"{format_metric(metric, value)} > {tolerance} × {format_metric(metric, reference)}"
+                    )
+    return regressions
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--fixtures",
+        choices=["auto", "recorded", "synthetic"],
+        default="auto",
+        help="auto: use recorded fixtures if present, otherwise synthetic ones",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="entry count multipliers for synthetic fixtures",
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="repetitions per metric")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=2.0,
+        help="fail if a metric exceeds this multiple of the baseline",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="record results as the baseline"
+    )
+    args = parser.parse_args()
+
+    fixtures = args.fixtures
+    if fixtures == "auto":
+        fixtures = "recorded" if FIXTURES.is_dir() else "synthetic"
+    if fixtures == "recorded" and args.scale != [1]:
+        parser.error("--scale only applies to synthetic fixtures")
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    if fixtures == "recorded":
+        print("# recorded", flush=True)
+        results["recorded"] = await run(FIXTURES, args.rounds)
+    else:
+        for scale in args.scale:
+            with tempfile.TemporaryDirectory() as root:
+                synthetic.generate(Path(root), scale=scale)
+                print(f"# synthetic ×{scale}", flush=True)
+                results[f"synthetic ×{scale}"] = await run(Path(root), args.rounds)
+
+    await http.close_client()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if args.save_baseline:
+        # 只保留三位有效数字，更多的位数只是噪声
+        baseline.update(
+            {
+                run_name: {
+                    backend: {k: float(f"{v:.3g}") for k, v in metrics.items()}
+                    for backend, metrics in backends.items()
+                }
+                for run_name, backends in results.items()
+            }
+        )
+        BASELINE.write_text(
+            json.dumps(baseline, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        print(f"Saved the baseline to {BASELINE}.")
+        return
+
+    if regressions := compare(results, baseline, args.tolerance):
+        print("Regressions:", *regressions, sep="\n- ")
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,312 @@
+"""生成合成的网站文件，结构与各网站的真实索引相同
+
+每个网站一个目录，其中文件的路径与真实网站相同，可直接用`http.server`提供。
+条目数按`scale`倍增，用于测试更大规模的索引。
+"""
+
+import json
+import random
+from pathlib import Path
+
+EN = [
+    "table",
+    "grid",
+    "cell",
+    "text",
+    "font",
+    "page",
+    "math",
+    "equation",
+    "figure",
+    "image",
+    "raw",
+    "list",
+    "enum",
+    "term",
+    "heading",
+    "outline",
+    "par",
+    "block",
+    "box",
+    "stack",
+    "align",
+    "place",
+    "rotate",
+    "scale",
+    "calc",
+    "round",
+    "floor",
+    "str",
+    "int",
+    "float",
+    "array",
+    "dict",
+    "content",
+    "function",
+    "type",
+    "parameter",
+    "hanging",
+    "indent",
+    "spacing",
+    "leading",
+    "justify",
+    "lang",
+    "region",
+    "numbering",
+    "counter",
+    "state",
+    "query",
+    "locate",
+    "metadata",
+    "bibliography",
+    "cite",
+    "ref",
+    "link",
+    "footnote",
+]
+ZH = [
+    "表格",
+    "字体",
+    "页面",
+    "公式",
+    "图片",
+    "代码",
+    "列表",
+    "标题",
+    "目录",
+    "段落",
+    "缩进",
+    "间距",
+    "对齐",
+    "编号",
+    "引用",
+    "参考文献",
+    "脚注",
+    "模板",
+    "封面",
+    "生僻字",
+    "下载",
+    "安装",
+    "配置",
+    "论文",
+    "格式",
+    "问题",
+    "常见",
+    "中文",
+    "排版",
+    "示例",
+]
+
+BASE_COUNTS = {
+    "bithesis.bitnp.net": 1500,
+    "typst-doc-cn.github.io": 1500,
+    "typst.app": 4000,
+    "sitandr.github.io": 600,
+    "packages.typst.org": 5000,
+}
+"""`scale=1`时各网站的条目数，与真实网站的量级相当"""
+
+N_PAGES = 120
+"""`scale=1`时 BIThesis 网站的网页数"""
+
+
+def title(rng: random.Random, *, zh: float = 0.5) -> str:
+    words = (
+        rng.choice(ZH if rng.random() < zh else EN).capitalize()
+        for _ in range(rng.randint(1, 4))
+    )
+    return " ".join(words)
+
+
+def write_vitepress(root: Path, base_path: str, n: int, rng: random.Random) -> None:
+    """VitePress 网站：HTML → theme → VPLocalSearchBox → @localSearchIndexroot"""
+    site = root / base_path.strip("/")
+    chunks = site / "assets" / "chunks"
+    chunks.mkdir(parents=True, exist_ok=True)
+
+    (site / "index.html").write_text(
+        f'<html><head><link rel="modulepreload" href="{base_path}/assets/chunks/theme.Bench123.js"></head></html>'
+    )
+    (chunks / "theme.Bench123.js").write_text(
+        'const e=()=>import("assets/chunks/VPLocalSearchBox.Bench456.js");'
+    )
+    (chunks / "VPLocalSearchBox.Bench456.js").write_text(
+        'const t=()=>import("./@localSearchIndexroot.Bench789.js");'
+    )
+
+    document_ids: dict[str, str] = {}
+    stored_fields: dict[str, dict] = {}
+    # 词项 ↦ 字段序号 ↦ 文档序号 ↦ 词频
+    inverted: dict[str, dict[str, dict[str, int]]] = {}
+    for i in range(n):
+        page = f"{base_path}/guide/page{i // 10}.html"
+        document_ids[str(i)] = page if i % 10 == 0 else f"{page}#h{i}"
+        fields = {
+            "title": title(rng),
+            "titles": []
+            if i % 10 == 0
+            else [title(rng) for _ in range(rng.randint(1, 2))],
+        }
+        stored_fields[str(i)] = fields
+        text = rng.choices(ZH + EN, k=50)
+        for field_id, words in enumerate(
+            [fields["title"].split(), " ".join(fields["titles"]).split(), text]
+        ):
+            for w in words:
+                docs = inverted.setdefault(w.lower(), {}).setdefault(str(field_id), {})
+                docs[str(i)] = docs.get(str(i), 0) + 1
+    index = {
+        "documentCount": n,
+        "nextId": n,
+        "documentIds": document_ids,
+        "fieldIds": {"title": 0, "titles": 1, "text": 2},
+        "fieldLength": {str(i): [2, 2, 50] for i in range(n)},
+        "averageFieldLength": [2, 2, 50],
+        "storedFields": stored_fields,
+        "dirtCount": 0,
+        "index": list(inverted.items()),
+        "serializationVersion": 2,
+    }
+    payload = json.dumps(index, ensure_ascii=False).replace("`", R"\`")
+    (chunks / "@localSearchIndexroot.Bench789.js").write_text(
+        f"const t=`{payload}`;export{{t as default}};"
+    )
+
+
+def write_sitemap(root: Path, n_pages: int, rng: random.Random) -> None:
+    """/sitemap.html 及其中列出的网页"""
+    lines = ["<ul>"]
+    for i in range(n_pages):
+        url = f"/guide/page{i}.html"
+        t = title(rng)
+        lines.append(f'<li><a href="{url}">{t}</a></li>')
+
+        body = "".join(
+            f"<h2>{title(rng)}</h2><p>{' '.join(rng.choices(ZH + EN, k=80))}</p>"
+            for _ in range(8)
+        )
+        path = root / url.lstrip("/")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            f'<html><body><nav>Navigation</nav><div class="vp-doc"><h1>{t}</h1>{body}</div></body></html>'
+        )
+    lines.append("</ul>")
+    (root / "sitemap.html").write_text("\n".join(lines) + "\n")
+
+
+def write_official_docs(root: Path, n: int, rng: random.Random) -> None:
+    items = []
+    for i in range(n):
+        t = title(rng, zh=0)
+        items.append(
+            {
+                "kind": rng.choice(
+                    ["Chapter", "Function", "Type", "Category", f"Parameter of {t}"]
+                ),
+                "title": t,
+                "route": f"/docs/reference/{rng.choice(EN)}/{t.lower().replace(' ', '-')}{i}/"
+                # 模块中的函数、类型中的定义，如`calc.round`、`grid.cell`
+                + rng.choice(
+                    [
+                        "",
+                        "",
+                        f"#functions-{rng.choice(EN)}",
+                        f"#definitions-{rng.choice(EN)}",
+                    ]
+                ),
+                "keywords": [],
+                "content": " ".join(rng.choices(EN, k=30)),
+            }
+        )
+    path = root / "assets" / "search.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"items": items}))
+
+
+def write_mdbook(root: Path, base_path: str, n: int, rng: random.Random) -> None:
+    """mdBook 网站：searchindex.json，含 elasticlunr 的倒排索引"""
+    docs = {}
+    urls = []
+    # elasticlunr 的倒排索引是逐字符的前缀树
+    trie: dict[str, dict] = {"body": {}, "breadcrumbs": {}, "title": {}}
+    for i in range(n):
+        t = title(rng, zh=0.1)
+        breadcrumbs = " » ".join(title(rng, zh=0.1) for _ in range(rng.randint(1, 3)))
+        body = " ".join(rng.choices(EN, k=60))
+        docs[str(i)] = {
+            "id": str(i),
+            "title": t,
+            "breadcrumbs": f"{breadcrumbs} » {t}",
+            "body": body,
+        }
+        urls.append(f"chapter{i}.html#{t.lower().replace(' ', '-')}")
+        for field_name, text in [
+            ("body", body),
+            ("breadcrumbs", breadcrumbs),
+            ("title", t),
+        ]:
+            for w in set(text.lower().split()):
+                node = trie[field_name]
+                for c in w:
+                    node = node.setdefault(c, {"docs": {}, "df": 0})
+                node["docs"][str(i)] = {"tf": 1.0}
+                node["df"] += 1
+    index = {
+        "doc_urls": urls,
+        "index": {
+            "documentStore": {"docInfo": {}, "docs": docs, "length": n, "save": True},
+            "index": {k: {"root": v} for k, v in trie.items()},
+            "pipeline": ["trimmer", "stopWordFilter", "stemmer"],
+            "ref": "id",
+            "version": "0.9.5",
+        },
+        "results_options": {"limit_results": 30, "teaser_word_count": 30},
+        "search_options": {"bool": "OR", "expand": True},
+    }
+    path = root / base_path.strip("/") / "searchindex.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(index))
+
+
+def write_registry(root: Path, n: int, rng: random.Random) -> None:
+    records = [
+        {
+            "name": f"package-{i // 5}",
+            "version": f"0.{i % 5}.0",
+            "entrypoint": "lib.typ",
+            "authors": ["Someone"],
+            "license": "MIT",
+            "description": " ".join(rng.choices(EN, k=20)),
+            "keywords": rng.choices(EN, k=5),
+            "categories": ["utility"],
+            "size": rng.randint(1000, 100000),
+            "readme": "README.md",
+            "updatedAt": 1700000000 + i,
+        }
+        for i in range(n)
+    ]
+    path = root / "preview" / "index.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(records))
+
+
+def generate(root: Path, *, scale: int = 1, seed: int = 42) -> None:
+    """在`root`下为每个网站生成一个目录"""
+    rng = random.Random(seed)
+
+    def n(site: str) -> int:
+        return BASE_COUNTS[site] * scale
+
+    write_vitepress(root / "bithesis.bitnp.net", "", n("bithesis.bitnp.net"), rng)
+    write_sitemap(root / "bithesis.bitnp.net", N_PAGES * scale, rng)
+    write_vitepress(
+        root / "typst-doc-cn.github.io", "/guide", n("typst-doc-cn.github.io"), rng
+    )
+    write_official_docs(root / "typst.app", n("typst.app"), rng)
+    write_mdbook(
+        root / "sitandr.github.io",
+        "/typst-examples-book/book",
+        n("sitandr.github.io"),
+        rng,
+    )
+    write_registry(root / "packages.typst.org", n("packages.typst.org"), rng)
@@ -6,9 +6,10 @@ https://github.com/Decent898/live2d-project-for-HCI/blob/dbfd27e3198600f84d50cb3
 
 import json
 
-import httpx
 from nonebot import get_plugin_config, logger
 
+from faq_bot.shared.http import get_client
+
 from .config import Config
 
 config = get_plugin_config(Config).chat
@@ -22,55 +23,57 @@ FOOTER = """
 async def handle(message: str) -> str:
     """回复消息"""
 
-    async with httpx.AsyncClient(
-        base_url=config.api_base,
-        headers={"ApiKey": config.app_token},
-    ) as client:
-        # 创建对话
-        r = await client.post(
-            "/create_conversation",
-            json={"UserID": config.user_id},
-        )
-        conversation = r.json()["Conversation"]["AppConversationID"]
-        logger.info(f"Created the conversation {conversation}")
-
-        # 提问
-        r = await client.post(
-            "/chat_query_v2",
-            json={
-                "UserID": config.user_id,
-                "Query": message,
-                "AppConversationID": conversation,
-                "ResponseMode": "streaming",  # 此处若选 blocking，则缺少 TracingJsonStr，而回答来源需要它，故选 streaming
-            },
-            timeout=60,  # 1 min
-        )
-        logger.info(f"Received the chat streaming of conversation {conversation}")
-
-        # 整理 streaming 的消息太复杂，所以我们只提取 message_id，准备重新获取消息
-        message_id: str | None = None
-        for line in r.text.splitlines():
-            if line.startswith("data:"):
-                if data := line.removeprefix("data:").strip():
-                    data = json.loads(data)
-                    if data["event"] == "message":
-                        message_id = data["id"]
-                        break
-        assert message_id is not None
-        logger.debug(
-            f"Extracted the message id: {message_id} for conversation {conversation}"
-        )
+    client = get_client()
+    headers = {"ApiKey": config.app_token}
 
-        # 重新获取消息
-        r = await client.post(
-            "/get_message_info",
-            json={
-                "UserID": config.user_id,
-                "MessageID": message_id,
-            },
-        )
-        response = r.json()
-        logger.debug(f"Parsed the message {message_id} of conversation {conversation}")
+    # 创建对话
+    r = await client.post(
+        f"{config.api_base}/create_conversation",
+        json={"UserID": config.user_id},
+        headers=headers,
+    )
+    conversation = r.json()["Conversation"]["AppConversationID"]
+    logger.info(f"Created the conversation {conversation}")
+
+    # 提问
+    r = await client.post(
+        f"{config.api_base}/chat_query_v2",
+        json={
+            "UserID": config.user_id,
+            "Query": message,
+            "AppConversationID": conversation,
+            "ResponseMode": "streaming",  # 此处若选 blocking，则缺少 TracingJsonStr，而回答来源需要它，故选 streaming
+        },
+        headers=headers,
+        timeout=60,  # 1 min
+    )
+    logger.info(f"Received the chat streaming of conversation {conversation}")
+
+    # 整理 streaming 的消息太复杂，所以我们只提取 message_id，准备重新获取消息
+    message_id: str | None = None
+    for line in r.text.splitlines():
+        if line.startswith("data:"):
+            if data := line.removeprefix("data:").strip():
+                data = json.loads(data)
+                if data["event"] == "message":
+                    message_id = data["id"]
+                    break
+    assert message_id is not None
+    logger.debug(
+        f"Extracted the message id: {message_id} for conversation {conversation}"
+    )
+
+    # 重新获取消息
+    r = await client.post(
+        f"{config.api_base}/get_message_info",
+        json={
+            "UserID": config.user_id,
+            "MessageID": message_id,
+        },
+        headers=headers,
+    )
+    response = r.json()
+    logger.debug(f"Parsed the message {message_id} of conversation {conversation}")
 
     answer: str = response["MessageInfo"]["AnswerInfo"]["Answer"]
     tracing: str = response["MessageInfo"]["AnswerInfo"]["TracingJsonStr"]
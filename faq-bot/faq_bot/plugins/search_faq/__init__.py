@@ -6,14 +6,18 @@ from faq_bot.shared.search import (
     add_handler,
     build_handler,
     search_by_minisearch_index,
+    search_by_sitemap_content,
     search_by_sitemap_html,
+    suggest_by_minisearch_index,
+    suggest_by_sitemap_content,
+    suggest_by_sitemap_html,
 )
 
 __plugin_meta__ = PluginMetadata(
     name="search",
     description="搜索 BIThesis 网站",
     usage="""
-搜索 bithesis.bitnp.net 的各级标题和 URL。目前不会搜索网页内容和标签。
+搜索 bithesis.bitnp.net 的各级标题、URL 和网页正文。目前不会搜索标签。
 
 用法：
 /search ⟨关键词⟩…
@@ -21,11 +25,12 @@ __plugin_meta__ = PluginMetadata(
 
 关键词可直接写，也可引用之前的消息。
 若提供多个关键词，则按照“或”理解。例如`/search A B`的结果是`/search A`与`/search B`之并。
+中文关键词不必分词，会自动切成相邻两字再搜索，例如`/search 生僻字怎么办`也能找到“生僻字”。
 
-只支持精确搜索；模糊搜索请直接使用网页上的搜索栏。
-优先搜索一级标题和 URL；若无结果，才会搜索全部级别的标题。
+只支持精确搜索；若无结果，会尝试纠正拼写，例如`/search dowload`会提示`download`。更模糊的搜索请直接使用网页上的搜索栏。
+优先搜索一级标题和 URL；若无结果，才会搜索全部级别的标题；若仍无结果，再搜索正文，先找以关键词开头的词，再全文搜索。
 
-为避免刷屏，最多显示五条结果；结果的顺序随机。
+为避免刷屏，最多显示五条结果。结果按相关程度排序：标题与关键词完全相同、标题以关键词开头、命中关键词多、标题级别高者优先。
 
 使用示例：
 /search download
@@ -40,7 +45,17 @@ add_handler(
     search,
     build_handler(
         base_url="https://bithesis.bitnp.net",
-        methods=[search_by_sitemap_html, search_by_minisearch_index],
+        methods=[
+            search_by_sitemap_html,
+            search_by_minisearch_index,
+            search_by_sitemap_content,
+        ],
         if_no_result="未找到结果，建议手动搜索。\nhttps://bithesis.bitnp.net/guide/ask-computer.html",
+        mode="concurrent",
+        suggest_methods=[
+            suggest_by_sitemap_html,
+            suggest_by_minisearch_index,
+            suggest_by_sitemap_content,
+        ],
     ),
 )
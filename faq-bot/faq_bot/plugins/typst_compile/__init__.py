@@ -1,9 +1,11 @@
+import asyncio
 from collections import deque
 from typing import Literal
 
-from nonebot import on_command, on_notice
+from nonebot import get_driver, get_plugin_config, on_command, on_notice
 from nonebot.adapters.onebot.v11 import (
     Bot,
+    GroupMessageEvent,
     GroupRecallNoticeEvent,
     Message,
     MessageEvent,
@@ -13,18 +15,25 @@ from nonebot.matcher import Matcher
 from nonebot.params import CommandArg
 from nonebot.plugin import PluginMetadata
 
+from faq_bot.shared import warmup
+
 from .clean import clean_reply
+from .config import Config
 from .history import pop_history, push_history
 from .preprocess import expand_magic
+from .render_cache import RenderCache, make_key
+from .scheduler import QueueFull, Scheduler
 from .typst import (
     PREAMBLE_BASIC,
     PREAMBLE_FIT_PAGE,
     PREAMBLE_USAGE,
+    Err,
     OkCompile,
     OkEval,
     typst_compile,
     typst_fonts,
 )
+from .watch import WatchPool
 
 __plugin_meta__ = PluginMetadata(
     name="typtyp",
@@ -52,8 +61,61 @@ __plugin_meta__ = PluginMetadata(
 ⟨文档⟩和先前发言中，一行开头的`!!⟨package⟩`会被展开为`#import "@preview/⟨package⟩:⟨version⟩": *;`，其中⟨version⟩是当前最新版本。
 
 若在群中使用时误发代码，可撤回原消息，机器人会跟着撤回，除非消息太久远了。
+
+同时编译的文档数有限，多人同时使用时需排队，各群、各人轮流编译。排队过长时会直接回复“繁忙”，请稍后再试。
 """.strip(),
+    config=Config,
 )
+
+config = get_plugin_config(Config).typst_compile
+scheduler = Scheduler(workers=config.workers, max_queued=config.max_queued)
+render_cache = RenderCache(
+    memory_size=config.render_cache_memory_size,
+    disk_size=config.render_cache_disk_size,
+)
+watch_pools: dict[str, WatchPool] = {}
+"""executable ↦ pool, used if `config.engine` is `"watch"`"""
+
+
+def get_watch_pool(executable: str | None) -> WatchPool:
+    executable = executable or "typst"
+    if executable not in watch_pools:
+        watch_pools[executable] = WatchPool(
+            executable,
+            max_jobs=config.watch_max_jobs,
+            max_memory=config.watch_max_memory,
+            timeout=config.watch_timeout,
+        )
+    return watch_pools[executable]
+
+
+async def compile_with_engine(
+    document: str,
+    /,
+    *,
+    executable: str | None = None,
+    reply: str | None = None,
+    preamble="",
+    command: Literal["compile", "eval"] = "compile",
+) -> OkCompile | OkEval | Err:
+    """Same as `typst_compile`, but use the configured engine."""
+    if config.engine == "watch" and command == "compile":
+        return await get_watch_pool(executable).compile(
+            document, reply=reply, preamble=preamble
+        )
+    return await typst_compile(
+        document, executable=executable, reply=reply, preamble=preamble, command=command
+    )
+
+
+async def close_watch_pools() -> None:
+    await asyncio.gather(*(pool.close() for pool in watch_pools.values()))
+
+
+if config.engine == "watch":
+    warmup.register("typst watch worker", get_watch_pool(None).warm_up)
+    get_driver().on_shutdown(close_watch_pools)
+
 typtyp = on_command("typtyp", priority=5, block=True)
 typ = on_command("typ", priority=5, block=True)
 typm = on_command("typm", priority=5, block=True)
@@ -100,10 +162,10 @@ async def handle(
     # Response to simple commands
     match (message.strip(), reply):
         case ("fonts", _):
-            await finish(typst_fonts(list_variants=False))
+            await finish(await typst_fonts(list_variants=False))
             return
         case ("fonts --variants" | "fonts variants", _):
-            await finish(typst_fonts(list_variants=True))
+            await finish(await typst_fonts(list_variants=True))
             return
         case ("", None):
             await finish(__plugin_meta__.usage)
@@ -152,17 +214,30 @@ async def handle(
 
     assert len(documents) in (1, 2)
 
-    # Compile
-    result = typst_compile(
-        documents[0],
-        reply=documents[1] if len(documents) > 1 else None,
-        preamble=preamble,
-        executable=executable,
-        command=command,
-    )
+    # Compile, or reuse the result
+    reply_to_sender = MessageSegment.reply(event.message_id)
+    inputs = {
+        "reply": documents[1] if len(documents) > 1 else None,
+        "preamble": preamble,
+        "executable": executable,
+        "command": command,
+    }
+
+    def job():
+        return scheduler.run(
+            lambda: compile_with_engine(documents[0], **inputs),
+            group=event.group_id if isinstance(event, GroupMessageEvent) else None,
+            user=event.user_id,
+        )
+
+    key = await make_key(documents[0], **inputs)
+    try:
+        result = await (render_cache.get_or_run(key, job) if key is not None else job())
+    except QueueFull:
+        await finish(reply_to_sender + "繁忙，正在编译的文档太多了，请稍后再试。")
+        return
 
     # Reply with the compiled image
-    reply_to_sender = MessageSegment.reply(event.message_id)
     if isinstance(result, OkCompile):
         message = reply_to_sender + Message(map(MessageSegment.image, result.pages))
         if result.stderr is not None:
@@ -0,0 +1,57 @@
+import os
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class ScopedConfig(BaseModel):
+    """Plugin Config Here"""
+
+    workers: int = Field(default_factory=lambda: os.cpu_count() or 1, ge=1)
+    """Maximum number of typst processes running at the same time
+
+    Defaults to the number of CPU cores.
+    """
+
+    max_queued: int = Field(default=16, ge=0)
+    """Maximum number of compilations waiting for a worker
+
+    Further requests are rejected with a busy reply immediately.
+    """
+
+    render_cache_memory_size: int = Field(default=64 * 2**20, ge=0)
+    """Maximum total size of cached results in memory, in bytes
+
+    0 disables the tier.
+    """
+
+    render_cache_disk_size: int = Field(default=2**30, ge=0)
+    """Maximum total size of cached results on disk, in bytes
+
+    0 disables the tier. Files are saved in `$FAQ_BOT_SNAPSHOT_DIR/typst_render/`.
+    """
+
+    engine: Literal["process", "watch"] = "process"
+    """How to run `typst compile`
+
+    - `"process"`: Start a `typst compile` process for each document.
+    - `"watch"`: Keep a pool of warm `typst watch` processes, reusing fonts, packages
+      and typst's memoization across documents. `typst eval` still starts a process.
+    """
+
+    watch_max_jobs: int = Field(default=100, ge=1)
+    """Recycle a `typst watch` worker after this many jobs"""
+
+    watch_max_memory: int = Field(default=2**30, ge=0)
+    """Recycle a `typst watch` worker when its resident memory exceeds this many bytes"""
+
+    watch_timeout: float = Field(default=60, gt=0)
+    """Seconds to wait for a `typst watch` worker
+
+    If the worker does not start in time, fall back to `typst compile`.
+    If it does not finish a compilation in time, reply that the compilation timed out.
+    """
+
+
+class Config(BaseModel):
+    typst_compile: ScopedConfig = ScopedConfig()
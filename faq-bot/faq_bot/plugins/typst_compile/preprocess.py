@@ -1,3 +1,5 @@
+import asyncio
+import json
 import re
 from collections import deque
 from collections.abc import Iterable
@@ -6,8 +8,10 @@ from itertools import groupby
 from operator import itemgetter
 from typing import TypeVar
 
-import httpx
-from async_lru import alru_cache
+from faq_bot.shared import warmup
+from faq_bot.shared.cache import refreshing_cache
+from faq_bot.shared.http import get_if_modified
+from faq_bot.shared.snapshot import Snapshot
 
 T = TypeVar("T")
 
@@ -56,13 +60,26 @@ async def expand_magic(document: str) -> tuple[str, deque[str]]:
     ), hints
 
 
-@alru_cache(ttl=timedelta(days=30).total_seconds())
+@refreshing_cache(
+    ttl=timedelta(days=30).total_seconds(),
+    snapshot=Snapshot("typst_package_registry", version=1),
+)
 async def load_registry() -> dict[str, str]:
-    """Load the registry as a map from package name to the latest version"""
-    async with httpx.AsyncClient() as client:
-        raw_index = (
-            await client.get("https://packages.typst.org/preview/index.json")
-        ).json()
+    """Load the registry as a map from package name to the latest version
+
+    Raises `NotModified` if the registry has not changed since the cached load.
+    """
+    response = await get_if_modified("https://packages.typst.org/preview/index.json")
+    # The index is several MB, so parse it in a thread to keep the event loop responsive
+    return await asyncio.to_thread(parse_registry, response.content)
+
+
+warmup.register("typst package registry", load_registry)
+
+
+def parse_registry(content: bytes) -> dict[str, str]:
+    """Parse `index.json` of the registry as a map from package name to the latest version"""
+    raw_index = json.loads(content)
 
     # name ⇒ latest version
     return {
@@ -0,0 +1,284 @@
+"""Content-addressed cache of compilation results
+
+The same snippets are compiled over and over, e.g. re-running a quoted message or
+trying the usage examples. A result only depends on the inputs, so we cache it by
+a hash of them, and a repeated compilation does not spawn typst at all.
+Identical compilations running at the same time (e.g. several people replying to
+the same message) are merged into one as well.
+
+There are two tiers:
+- Memory: LRU, bounded by the total size of results.
+- Disk: `Snapshot("typst_render")`, which survives restarts. The least recently
+  used files are removed when the total size exceeds the limit.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Final, NamedTuple
+
+from nonebot import logger
+
+from faq_bot.shared.snapshot import Snapshot
+
+from .typst import Err, OkCompile, OkEval, run
+
+Result = OkCompile | OkEval | Err
+
+_snapshot: Final = Snapshot[Result]("typst_render", version=2)
+
+_TODAY: Final = re.compile(r"\bdatetime\s*\.\s*today\b")
+"""`datetime.today()` makes the output depend on when it runs"""
+
+_versions: dict[str, tuple[tuple[str, int, int], str]] = {}
+"""executable ↦ ((path, mtime, size), version)"""
+
+
+async def executable_version(executable: str) -> str | None:
+    """Get the output of `typst --version`.
+
+    Cached until the executable file changes.
+    If the executable does not exist or fails, return `None`.
+    """
+    path = shutil.which(executable)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    signature = (path, stat.st_mtime_ns, stat.st_size)
+
+    cached = _versions.get(executable)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    result = await run([path, "--version"])
+    if result.returncode != 0:
+        return None
+    version = result.stdout.strip()
+    _versions[executable] = (signature, version)
+    return version
+
+
+async def make_key(
+    document: str,
+    /,
+    *,
+    executable: str | None = None,
+    reply: str | None = None,
+    preamble="",
+    command="compile",
+) -> str | None:
+    """Hash the inputs of `typst_compile`.
+
+    Package versions are covered by the document itself: typst requires imports
+    to specify the full version, and `!!⟨package⟩` has been expanded beforehand.
+
+    Return `None` if uncacheable, i.e. the version of the executable is unknown,
+    or the inputs call `datetime.today`.
+    """
+    if any(_TODAY.search(text or "") for text in (document, reply, preamble)):
+        return None
+
+    version = await executable_version(executable or "typst")
+    if version is None:
+        return None
+
+    # JSON keeps the fields apart, and distinguishes `reply=None` from `reply=""`.
+    inputs = json.dumps([version, command, preamble, document, reply])
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+def result_size(result: Result) -> int:
+    """Approximate memory usage in bytes"""
+    match result:
+        case OkCompile(pages=pages, stderr=stderr):
+            return sum(map(len, pages)) + len(stderr or "")
+        case OkEval(stdout=stdout, stderr=stderr):
+            return len(stdout) + len(stderr or "")
+        case Err(stderr=stderr):
+            return len(stderr)
+
+
+def is_deterministic(result: Result) -> bool:
+    """Whether the result only depends on the inputs"""
+    if not isinstance(result, Err):
+        return True
+    # Killed by a signal, e.g. by the OOM killer or during shutdown
+    if result.returncode is not None and result.returncode < 0:
+        return False
+    # Downloading packages may fail temporarily.
+    return "failed to download" not in result.stderr
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    """Bytes"""
+    currsize: int
+    """Bytes"""
+
+
+class RenderCache:
+    """A two-tier cache of compilation results
+
+    Only works for single-threading.
+    """
+
+    def __init__(
+        self, *, memory_size: int, disk_size: int, report_every: int = 100
+    ) -> None:
+        """
+        Args:
+            memory_size: Maximum total size of results in memory, in bytes. 0 disables the tier.
+            disk_size: Maximum total size of files on disk, in bytes. 0 disables the tier.
+            report_every: Log the hit rate every this many lookups.
+        """
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.report_every = report_every
+        self.hits = 0
+        self.misses = 0
+
+        self._results: OrderedDict[str, Result] = OrderedDict()
+        """key ↦ result, the most recently used last"""
+        self._memory_used = 0
+        self._disk_used: int | None = None
+        """Total size of files on disk, or `None` if not scanned yet"""
+        self._tasks: dict[str, asyncio.Task[Result]] = {}
+        """Running jobs, to avoid running identical ones at the same time"""
+
+    async def get_or_run(
+        self, key: str, job: Callable[[], Awaitable[Result]]
+    ) -> Result:
+        """Look up a result, or run `job` to get and cache it.
+
+        If an identical job is running, wait for it instead of running `job`.
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            logger.info("Joined an identical compilation in progress.")
+        else:
+            result = await self.get(key)
+            if result is not None:
+                return result
+
+            # Check again, because another identical job might start during `get`.
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.create_task(self._run(key, job))
+                self._tasks[key] = task
+                task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        # shield: Keep running even if a requester is cancelled, because others may be waiting.
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, job: Callable[[], Awaitable[Result]]) -> Result:
+        result = await job()
+        await self.put(key, result)
+        return result
+
+    async def get(self, key: str) -> Result | None:
+        """Look up a result. If not cached, return `None`."""
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        elif self.disk_size > 0:
+            result = await asyncio.to_thread(self._load, key)
+            if result is not None:
+                self._remember(key, result)
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        if (self.hits + self.misses) % self.report_every == 0:
+            logger.info(f"Render cache: {self.info()}")
+
+        return result
+
+    async def put(self, key: str, result: Result) -> None:
+        """Cache a result, unless it might change next time.
+
+        Errors of the disk tier are logged and ignored, because the result is still valid.
+        """
+        if not is_deterministic(result):
+            return
+        self._remember(key, result)
+        if self.disk_size <= 0:
+            return
+
+        try:
+            size = await asyncio.to_thread(self._save, key, result)
+            if self._disk_used is not None:
+                self._disk_used += size
+            if self._disk_used is None or self._disk_used > self.disk_size:
+                self._disk_used = await asyncio.to_thread(self._prune)
+        except OSError as error:
+            logger.warning(f"Failed to save the result to the disk: {error!r}")
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.memory_size, self._memory_used)
+
+    def _remember(self, key: str, result: Result) -> None:
+        """Put into the memory tier."""
+        size = result_size(result)
+        if size > self.memory_size:
+            return
+
+        previous = self._results.pop(key, None)
+        if previous is not None:
+            self._memory_used -= result_size(previous)
+        self._results[key] = result
+        self._memory_used += size
+
+        while self._memory_used > self.memory_size:
+            _, evicted = self._results.popitem(last=False)
+            self._memory_used -= result_size(evicted)
+
+    def _load(self, key: str) -> Result | None:
+        loaded = _snapshot.load(key)
+        if loaded is None:
+            return None
+        # Mark as recently used, so that `_prune` keeps it.
+        try:
+            os.utime(_snapshot.path(key))
+        except FileNotFoundError:
+            pass
+        return loaded[0]
+
+    def _save(self, key: str, result: Result) -> int:
+        """Put into the disk tier, and return the file size."""
+        _snapshot.save(key, result, {})
+        return _snapshot.path(key).stat().st_size
+
+    def _prune(self) -> int:
+        """Remove the least recently used files, until there is room for new ones.
+
+        Returns the total size of the remaining files.
+        """
+        directory = _snapshot.path("").parent
+        files = sorted(
+            ((f.stat(), f) for f in directory.glob("*.bin")),
+            key=lambda pair: pair[0].st_mtime,
+        )
+        used = sum(stat.st_size for stat, _ in files)
+
+        # Leave some room, so that we do not prune on every save.
+        target = self.disk_size * 3 // 4 if used > self.disk_size else self.disk_size
+        removed = 0
+        for stat, file in files:
+            if used <= target:
+                break
+            file.unlink(missing_ok=True)
+            used -= stat.st_size
+            removed += 1
+
+        if removed:
+            logger.info(f"Removed {removed} old results from {directory}.")
+        return used
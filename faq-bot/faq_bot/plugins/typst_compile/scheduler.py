@@ -0,0 +1,113 @@
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class QueueFull(Exception):
+    """Too many compilations are waiting for a worker."""
+
+
+class Scheduler:
+    """Limit concurrent jobs, and share workers fairly.
+
+    At most `workers` jobs run at the same time. The others wait in queues, and
+    free workers are handed out round-robin, first across groups, then across
+    users within each group. Therefore a user sending many jobs only delays
+    their own, and a busy group does not starve the others.
+
+    Only works for single-threading.
+    """
+
+    def __init__(self, *, workers: int, max_queued: int) -> None:
+        self._idle = workers
+        """Number of idle workers"""
+
+        self._max_queued = max_queued
+        self._queued = 0
+        """Number of tickets in `_queues`"""
+
+        self._queues: OrderedDict[
+            Hashable, OrderedDict[Hashable, deque[asyncio.Future[None]]]
+        ] = OrderedDict()
+        """group ↦ user ↦ tickets
+
+        A ticket resolves when a worker is handed to it.
+        The group (or user) to be served next comes first.
+        """
+
+    async def run(
+        self, job: Callable[[], Awaitable[T]], *, group: Hashable, user: Hashable
+    ) -> T:
+        """Wait for a worker, and run `job` with it.
+
+        Raises:
+            QueueFull: `max_queued` jobs are already waiting. Raised immediately.
+        """
+        await self._acquire(group, user)
+        try:
+            return await job()
+        finally:
+            self._release()
+
+    async def _acquire(self, group: Hashable, user: Hashable) -> None:
+        if self._idle > 0 and self._queued == 0:
+            self._idle -= 1
+            return
+
+        if self._queued >= self._max_queued:
+            raise QueueFull
+
+        ticket = asyncio.get_running_loop().create_future()
+        users = self._queues.setdefault(group, OrderedDict())
+        users.setdefault(user, deque()).append(ticket)
+        self._queued += 1
+
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                # A worker has been handed to us, so pass it on.
+                self._release()
+            else:
+                self._discard(ticket, group, user)
+            raise
+
+    def _release(self) -> None:
+        """Hand the worker to the next ticket, or mark it as idle."""
+        while self._queues:
+            group, users = self._queues.popitem(last=False)
+            user, tickets = users.popitem(last=False)
+            ticket = tickets.popleft()
+            self._queued -= 1
+
+            # Move to the end of the rotation
+            if tickets:
+                users[user] = tickets
+            if users:
+                self._queues[group] = users
+
+            # Skip tickets cancelled but not discarded yet
+            if not ticket.done():
+                ticket.set_result(None)
+                return
+
+        self._idle += 1
+
+    def _discard(
+        self, ticket: asyncio.Future[None], group: Hashable, user: Hashable
+    ) -> None:
+        """Remove a cancelled ticket from the queues, if still there."""
+        users = self._queues.get(group)
+        tickets = users.get(user) if users is not None else None
+        if tickets is None or ticket not in tickets:
+            return
+
+        tickets.remove(ticket)
+        self._queued -= 1
+        if not tickets:
+            del users[user]
+        if not users:
+            del self._queues[group]
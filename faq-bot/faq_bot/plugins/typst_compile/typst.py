@@ -1,7 +1,8 @@
+import asyncio
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from subprocess import run
+from subprocess import DEVNULL, PIPE, CompletedProcess
 from tempfile import TemporaryDirectory
 from typing import Final, Literal
 
@@ -65,9 +66,52 @@ class OkEval:
 @dataclass
 class Err:
     stderr: str
+    returncode: int | None = None
+    """Exit status of typst, negative if killed by a signal, or `None` if unknown"""
 
 
-def typst_compile(
+async def run(
+    args: list[str], *, cwd: Path | None = None, input: str | None = None
+) -> CompletedProcess[str]:
+    """Run a command without blocking the event loop
+
+    Like `subprocess.run(args, capture_output=True, text=True)`, but awaitable,
+    so that other handlers keep responding during a long compilation.
+    If the awaiting task is cancelled, the process is killed.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        stdin=DEVNULL if input is None else PIPE,
+        stdout=PIPE,
+        stderr=PIPE,
+    )
+    try:
+        stdout, stderr = await process.communicate(
+            None if input is None else input.encode()
+        )
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+    assert process.returncode is not None
+    return CompletedProcess(
+        args,
+        process.returncode,
+        stdout.decode(errors="replace"),
+        stderr.decode(errors="replace"),
+    )
+
+
+def read_pages(cwd: Path) -> list[bytes]:
+    """Read PNG pages in order"""
+    # We can also collect pages from `--make-deps`, but parsing Makefile is fragile.
+    return [p.read_bytes() for p in sorted(cwd.glob("*.png"))]
+
+
+async def typst_compile(
     document: str,
     /,
     *,
@@ -98,7 +142,7 @@ def typst_compile(
 
         match command:
             case "compile":
-                result = run(
+                result = await run(
                     [
                         executable or "typst",
                         "compile",
@@ -108,12 +152,10 @@ def typst_compile(
                     ],
                     cwd=cwd,
                     input="\n".join([preamble, document]),
-                    capture_output=True,
-                    text=True,
                 )
             case "eval":
                 assert not preamble, "preamble is not supported with eval"
-                result = run(
+                result = await run(
                     [
                         executable or "typst",
                         "eval",
@@ -122,8 +164,6 @@ def typst_compile(
                         *([] if reply is None else ["--in", str(re_typ)]),
                     ],
                     cwd=cwd,
-                    capture_output=True,
-                    text=True,
                 )
 
         stderr = improve_diagnostics(
@@ -139,10 +179,9 @@ def typst_compile(
         if result.returncode == 0:
             match command:
                 case "compile":
-                    # We can also collect pages from `--make-deps`, but parsing Makefile is fragile.
-                    pages = sorted(cwd.glob("*.png"))
+                    # Pages may take several MB in total
                     return OkCompile(
-                        pages=[p.read_bytes() for p in pages],
+                        pages=await asyncio.to_thread(read_pages, cwd),
                         stderr=stderr if stderr != "" else None,
                     )
                 case "eval":
@@ -151,7 +190,7 @@ def typst_compile(
                         stderr=stderr if stderr != "" else None,
                     )
         else:
-            return Err(stderr=stderr)
+            return Err(stderr=stderr, returncode=result.returncode)
 
 
 def improve_diagnostics(
@@ -201,11 +240,11 @@ def improve_diagnostics(
     return stderr
 
 
-def typst_fonts(*, list_variants=False) -> str:
+async def typst_fonts(*, list_variants=False) -> str:
     """Lists all discovered fonts with their style variants."""
-    fonts = run(
-        ["typst", "fonts", "--variants"] if list_variants else ["typst", "fonts"],
-        capture_output=True,
-        text=True,
+    fonts = (
+        await run(
+            ["typst", "fonts", "--variants"] if list_variants else ["typst", "fonts"]
+        )
     ).stdout
     return fonts
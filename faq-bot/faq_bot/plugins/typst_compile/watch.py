@@ -0,0 +1,352 @@
+"""Warm `typst watch` workers
+
+`typst compile` starts from scratch every time: it discovers fonts, parses the
+preamble, and loads packages again. A `typst watch` process keeps all of them in
+memory, so we keep a pool of such processes, and compile by rewriting the watched file.
+
+Each worker runs in its own directory:
+- `main.typ`: The watched file. It contains the preamble, and includes the document of the current job.
+- `jobs/⟨n⟩/doc.typ` and `jobs/⟨n⟩/re.typ`: The document and the reply of the n-th job.
+  A new directory for each job ensures that only the replacement of `main.typ` triggers a compilation.
+- `⟨total⟩-⟨page⟩.png`: The output.
+  In watch mode, typst skips pages that have not changed since the last compilation,
+  so we keep the previous pages in memory, and learn the page count from file names.
+
+Workers are recycled after a number of jobs or when their memory grows too large.
+If a worker fails or its result is ambiguous, the job falls back to `typst_compile`.
+"""
+
+import asyncio
+import re
+import shutil
+import signal
+from pathlib import Path
+from subprocess import DEVNULL, PIPE
+from tempfile import TemporaryDirectory
+from typing import Final
+
+from nonebot import logger
+
+from .typst import Err, OkCompile, improve_diagnostics, typst_compile
+
+_QUIET_PERIOD: Final = 0.05
+"""Seconds without output after which a compilation is considered finished
+
+typst prints diagnostics after the status line, with no end marker.
+"""
+
+_STATUS: Final = re.compile(
+    r"^\[[\d:]+\] (compiling|compiled (?P<outcome>successfully|with warnings|with errors))"
+)
+_ANSI_ESCAPE: Final = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+_PAGE: Final = re.compile(r"^(?P<total>\d+)-(?P<page>\d+)\.png$")
+
+
+class WatchFailed(Exception):
+    """The worker is broken, and should be discarded."""
+
+
+class Worker:
+    """A `typst watch` process with its own directory
+
+    Only one job at a time.
+    """
+
+    def __init__(
+        self, process: asyncio.subprocess.Process, directory: TemporaryDirectory
+    ) -> None:
+        self.jobs = 0
+        """Number of jobs started"""
+
+        self._process = process
+        self._directory = directory
+        self._cwd = Path(directory.name)
+
+        self._pages: list[bytes] = []
+        """Pages of previous compilations, matching typst's export cache
+
+        Pages beyond the current page count are kept, because typst keeps them too.
+        """
+
+        self._lines: asyncio.Queue[str | None] = asyncio.Queue()
+        """Lines of stderr, ending with `None` when the process exits"""
+        self._reader = asyncio.create_task(self._read_stderr())
+
+    @classmethod
+    async def start(cls, executable: str) -> "Worker":
+        """Start a worker, and wait for its initial compilation."""
+        directory = TemporaryDirectory(prefix="typst-watch-")
+        cwd = Path(directory.name)
+        (cwd / "main.typ").write_text("", encoding="utf-8")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                executable,
+                "watch",
+                "main.typ",
+                "{t}-{0p}.png",
+                "--root=.",
+                cwd=cwd,
+                stdin=DEVNULL,
+                stdout=DEVNULL,
+                stderr=PIPE,
+            )
+        except BaseException:
+            directory.cleanup()
+            raise
+
+        worker = cls(process, directory)
+        logger.info(f"Started typst watch in {cwd}.")
+        try:
+            await worker._wait()
+            worker._collect_pages()
+        except BaseException:
+            await worker.close()
+            raise
+        return worker
+
+    async def close(self) -> None:
+        """Stop the process, wait for it to exit, and remove the directory.
+
+        A job in progress fails with `WatchFailed`. Safe to call more than once.
+        """
+        if self._process.returncode is None:
+            self._process.kill()
+        await self._process.wait()
+        # The reader ends at EOF, after telling the job in progress that the process has exited.
+        await self._reader
+        self._directory.cleanup()
+
+    def memory(self) -> int | None:
+        """Resident memory of the process in bytes, or `None` if unknown (e.g. not on Linux)"""
+        try:
+            status = Path(f"/proc/{self._process.pid}/status").read_text()
+        except OSError:
+            return None
+        match = re.search(r"^VmRSS:\s*(\d+) kB", status, flags=re.MULTILINE)
+        return int(match.group(1)) * 1024 if match is not None else None
+
+    async def compile(
+        self, document: str, /, *, reply: str | None = None, preamble=""
+    ) -> OkCompile | Err | None:
+        """Compile a document.
+
+        Returns `None` if the page count is ambiguous, which happens if no page has
+        changed since the last compilation. The worker can still be used.
+
+        Raises:
+            WatchFailed: The worker is broken.
+        """
+        self._drain()
+        self.jobs += 1
+
+        job = f"jobs/{self.jobs}"
+        (self._cwd / job).mkdir(parents=True)
+        (self._cwd / job / "doc.typ").write_text(document, encoding="utf-8")
+        if reply is not None:
+            (self._cwd / job / "re.typ").write_text(reply, encoding="utf-8")
+
+        # Replace atomically, so that typst does not see a partially written file.
+        main = self._cwd / "main.typ.tmp"
+        main.write_text(f'{preamble}\n#include "{job}/doc.typ"\n', encoding="utf-8")
+        main.replace(self._cwd / "main.typ")
+
+        outcome, diagnostics = await self._wait()
+
+        # The previous job is no longer a dependency, so removing it does not trigger a compilation.
+        shutil.rmtree(self._cwd / f"jobs/{self.jobs - 1}", ignore_errors=True)
+
+        # Make paths look like `typst compile -` with `re.typ` in the root
+        diagnostics = re.sub(rf"/?{job}/doc\.typ\b", "<stdin>", diagnostics)
+        diagnostics = re.sub(rf"/?{job}/", "", diagnostics)
+        stderr = improve_diagnostics(diagnostics, cwd=self._cwd)
+
+        if outcome == "with errors":
+            return Err(stderr=stderr)
+
+        pages = self._collect_pages()
+        if pages is None:
+            return None
+        return OkCompile(pages=pages, stderr=stderr if stderr != "" else None)
+
+    async def _read_stderr(self) -> None:
+        assert self._process.stderr is not None
+        async for line in self._process.stderr:
+            text = line.decode(errors="replace").rstrip("\n")
+            self._lines.put_nowait(_ANSI_ESCAPE.sub("", text))
+        self._lines.put_nowait(None)
+
+    def _drain(self) -> None:
+        """Discard output of compilations between jobs, if any."""
+        while not self._lines.empty():
+            if self._lines.get_nowait() is None:
+                raise WatchFailed("typst watch has exited")
+
+    async def _wait(self) -> tuple[str, str]:
+        """Wait for a compilation to finish.
+
+        Returns:
+            (outcome, diagnostics), where outcome is `"successfully"`, `"with warnings"` or `"with errors"`.
+        """
+        outcome: str | None = None
+        diagnostics: list[str] = []
+        while True:
+            try:
+                line = await asyncio.wait_for(
+                    self._lines.get(),
+                    timeout=None if outcome is None else _QUIET_PERIOD,
+                )
+            except asyncio.TimeoutError:
+                assert outcome is not None
+                return outcome, "\n".join(diagnostics).strip("\n")
+
+            if line is None:
+                raise WatchFailed("typst watch has exited")
+            elif line.startswith("watching "):
+                # Header of a new status
+                outcome = None
+                diagnostics.clear()
+            elif (match := _STATUS.match(line)) is not None:
+                # `None` if still compiling
+                outcome = match.group("outcome")
+                diagnostics.clear()
+            elif outcome is not None:
+                diagnostics.append(line)
+
+    def _collect_pages(self) -> list[bytes] | None:
+        """Read and remove the written pages, and fill in the skipped ones.
+
+        Returns `None` if no page is written, because then the page count is unknown.
+        """
+        written: dict[int, bytes] = {}
+        totals: set[int] = set()
+        for file in self._cwd.glob("*.png"):
+            match = _PAGE.match(file.name)
+            if match is None:
+                raise WatchFailed(f"unexpected output: {file.name}")
+            totals.add(int(match.group("total")))
+            written[int(match.group("page"))] = file.read_bytes()
+            file.unlink()
+
+        if not written:
+            return None
+        if len(totals) != 1:
+            raise WatchFailed(f"inconsistent page counts: {totals}")
+        (total,) = totals
+
+        pages: list[bytes] = []
+        for i in range(total):
+            page = written.get(i + 1)
+            if page is None:
+                if i >= len(self._pages):
+                    raise WatchFailed(f"page {i + 1} is neither written nor cached")
+                page = self._pages[i]
+            pages.append(page)
+
+        self._pages[:total] = pages
+        return pages
+
+
+class WatchPool:
+    """A pool of warm workers for an executable
+
+    The number of workers grows with the number of concurrent jobs,
+    which is bounded by the scheduler.
+    """
+
+    def __init__(
+        self, executable: str, *, max_jobs: int, max_memory: int, timeout: float
+    ) -> None:
+        """
+        Args:
+            executable: typst executable
+            max_jobs: Recycle a worker after this many jobs.
+            max_memory: Recycle a worker when its resident memory exceeds this many bytes.
+            timeout: Seconds to wait for a worker to start, before falling back to `typst_compile`;
+                or to compile, before giving up with an `Err`
+        """
+        self.executable = executable
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.timeout = timeout
+
+        self._idle: list[Worker] = []
+        self._busy: set[Worker] = set()
+        """Workers running a job, tracked so that `close` can stop them too"""
+        self._closed = False
+
+    async def warm_up(self) -> None:
+        """Start a worker in advance."""
+        worker = await asyncio.wait_for(Worker.start(self.executable), self.timeout)
+        await self._recycle(worker)
+
+    async def compile(
+        self, document: str, /, *, reply: str | None = None, preamble=""
+    ) -> OkCompile | Err:
+        """Compile a document with a warm worker. See `Worker.compile`."""
+        worker = self._idle.pop() if self._idle else None
+        try:
+            if worker is None:
+                try:
+                    worker = await asyncio.wait_for(
+                        Worker.start(self.executable), self.timeout
+                    )
+                except asyncio.TimeoutError as error:
+                    # Not the document's fault
+                    raise WatchFailed("typst watch did not start in time") from error
+            self._busy.add(worker)
+            result = await asyncio.wait_for(
+                worker.compile(document, reply=reply, preamble=preamble), self.timeout
+            )
+        except BaseException as error:
+            # The worker may be in the middle of a compilation.
+            if worker is not None:
+                self._busy.discard(worker)
+                await worker.close()
+            if isinstance(error, asyncio.TimeoutError):
+                # Compiling again with `typst_compile` would take even longer.
+                # Marked as killed, so that the result is not cached.
+                logger.warning(f"typst watch did not compile in {self.timeout} s.")
+                return Err(
+                    stderr=f"error: compilation timed out after {self.timeout:g} s",
+                    returncode=-signal.SIGKILL,
+                )
+            if not isinstance(error, (WatchFailed, OSError)):
+                raise
+            logger.warning(
+                f"Falling back to typst compile because typst watch failed: {error!r}"
+            )
+            result = None
+        else:
+            self._busy.discard(worker)
+            await self._recycle(worker)
+
+        if result is None:
+            return await typst_compile(
+                document, executable=self.executable, reply=reply, preamble=preamble
+            )
+        return result
+
+    async def close(self) -> None:
+        """Stop all workers, including busy ones, whose jobs fall back to `typst_compile`."""
+        self._closed = True
+        workers = [*self._idle, *self._busy]
+        self._idle.clear()
+        await asyncio.gather(*(worker.close() for worker in workers))
+
+    async def _recycle(self, worker: Worker) -> None:
+        """Put the worker back, or stop it if it has worked enough or the pool is closed."""
+        if self._closed:
+            await worker.close()
+            return
+
+        memory = worker.memory()
+        if worker.jobs >= self.max_jobs or (
+            memory is not None and memory > self.max_memory
+        ):
+            logger.info(
+                f"Recycled a typst watch worker after {worker.jobs} jobs, using {memory} bytes."
+            )
+            await worker.close()
+        else:
+            self._idle.append(worker)
@@ -6,9 +6,12 @@ from faq_bot.shared.search import (
     build_handler,
     search_by_mdbook_index,
     search_by_minisearch_index,
+    suggest_by_mdbook_index,
+    suggest_by_minisearch_index,
 )
 
 from .by_official_docs import search as search_by_official_docs
+from .by_official_docs import suggest as suggest_by_official_docs
 
 __plugin_meta__ = PluginMetadata(
     name="tyd",
@@ -19,17 +22,19 @@ __plugin_meta__ = PluginMetadata(
 /typdoc ⟨关键词⟩…
 /typst-doc ⟨关键词⟩…
 
-1. 先搜索 typst-doc-cn.github.io/guide 的各级标题和 URL。
-2. 若无结果，再搜索 typst.app/docs 的标题和类型名。
-3. 若无结果，继续搜索 sitandr.github.io/typst-examples-book/book 的各级标题。
-目前不会搜索网页内容和标签。
+同时搜索以下来源，合并结果：
+1. typst-doc-cn.github.io/guide 的各级标题和 URL，若无结果，再搜索正文中以关键词开头的词；
+2. typst.app/docs 的标题和函数、类型的路径，路径可只写开头，如`/tyd grid.c`能找到`grid.cell`；
+3. sitandr.github.io/typst-examples-book/book 的各级标题。
+其余来源目前不会搜索网页正文；所有来源都不会搜索标签。某一来源响应太慢时，会跳过它。
 
 关键词可直接写，也可引用之前的消息。
 若提供多个关键词，则按照“或”理解。例如`/tyd A B`的结果是`/tyd A`与`/tyd B`之并。
+中文关键词不必分词，会自动切成相邻两字再搜索，例如`/tyd 三线表怎么画`也能找到“三线表”。
 
-只支持精确搜索；模糊搜索请直接使用网页上的搜索栏。
+只支持精确搜索；若无结果，会尝试纠正拼写，例如`/tyd tabel`会提示`table`。更模糊的搜索请直接使用网页上的搜索栏。
 
-为避免刷屏，最多显示五条结果；结果的顺序随机。
+为避免刷屏，最多显示五条结果。结果按相关程度排序：标题与关键词完全相同、标题以关键词开头、命中关键词多、标题级别高者优先；相关程度相同时，按上述来源顺序。
 
 使用示例：
 /tyd Word
@@ -57,5 +62,11 @@ add_handler(
             search_by_mdbook_index,
         ],
         if_no_result="未找到结果，建议手动搜索。\n详见`/help tyd`。",
+        mode="merged",
+        suggest_methods=[
+            suggest_by_minisearch_index,
+            suggest_by_official_docs,
+            suggest_by_mdbook_index,
+        ],
     ),
 )
@@ -1,56 +1,150 @@
-"""根据 typst 官方文档搜索标题"""
+"""根据 typst 官方文档搜索标题，以及函数、类型的路径"""
 
+import asyncio
 import json
-from dataclasses import dataclass
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
 from datetime import timedelta
 
-import httpx
-from async_lru import alru_cache
+from faq_bot.shared.cache import previous_value, refreshing_cache
+from faq_bot.shared.http import get_if_modified
+from faq_bot.shared.search.by import AbstractEntry, SearchFn, SuggestFn
+from faq_bot.shared.search.index import NgramIndex
+from faq_bot.shared.search.prefix import PrefixIndex
+from faq_bot.shared.search.tokenize import normalize
+from faq_bot.shared.snapshot import Snapshot
 
-from faq_bot.shared.search.by import AbstractEntry, SearchFn, match
 
-
-@dataclass
+# frozen: 可散列，以便增量更新索引时比较新旧条目
+@dataclass(slots=True, frozen=True)
 class Entry(AbstractEntry):
     kind: str
     """`Chapter`, `Function`, `Parameter of terms`, etc."""
     title: str
     """`0.13.1`, `Term List`, `Hanging Indent`, etc."""
     url: str
+    keys: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # 函数、类型匹配标题和路径，其余只匹配标题
+        if self.kind in ["Function", "Type"]:
+            path = dotted_path(self.url)
+            object.__setattr__(self, "keys", (normalize(self.title), normalize(path)))
+        else:
+            object.__setattr__(self, "keys", (normalize(self.title),))
+
+    @property
+    def depth(self) -> int:
+        # `/docs/reference/text/` → 2, `/docs/reference/text/text/#parameters-font` → 4
+        return self.url.strip("/").count("/") + ("#" in self.url)
 
     def human(self) -> str:
         return " - ".join([self.title, self.kind])
 
 
-async def search_impl(base_url: str, keywords: list[str]) -> list[Entry]:
+def dotted_path(route: str) -> str:
+    """函数、类型在 typst 中的路径
+
+    `/docs/reference/text/text/` → `text`,
+    `/docs/reference/layout/grid/#definitions-cell` → `grid.cell`,
+    `/docs/reference/foundations/calc/#functions-round` → `calc.round`
+    """
+    page, _, fragment = route.partition("#")
+    name = page.removesuffix("/").split("/")[-1]
+    section, _, member = fragment.partition("-")
+    if section in ["definitions", "functions"] and member:
+        return f"{name}.{member}"
+    return name
+
+
+class OfficialDocsIndex(NgramIndex[Entry]):
+    """另按前缀匹配标题和函数、类型的路径
+
+    人们常输入路径的开头，如`grid.c`、`calc.ro`。含`.`的关键词先按前缀查找，
+    代价为 O(前缀长度 × log 条目数 + 结果数)；若无结果（如`13.1`、`.cell`），
+    再按`NgramIndex`匹配子串。其余关键词只匹配子串。
+    """
+
+    __slots__ = ("prefixes",)
+
+    def __init__(self, entries: Iterable[Entry], *, n: int = 2) -> None:
+        super().__init__(entries, n=n)
+        self.prefixes = self._build_prefixes()
+        """标题和路径 ↦ 条目序号"""
+
+    def updated(self, entries: Iterable[Entry]) -> "OfficialDocsIndex":
+        index = super().updated(entries)
+        assert isinstance(index, OfficialDocsIndex)
+        if index.prefixes is self.prefixes:
+            # 增量更新时条目的序号可能改变，直接重建，只需排序一次
+            index.prefixes = index._build_prefixes()
+        return index
+
+    def _build_prefixes(self) -> PrefixIndex:
+        return PrefixIndex(
+            (k, [id_])
+            for id_, e in enumerate(self.entries)
+            if e is not None
+            for k in e.keys
+        )
+
+    def _lookup(self, key: str) -> int:
+        # 以`key`开头必然包含`key`，所以有结果时不必再匹配子串
+        if "." in key and (mask := self.prefixes.lookup(key, len(self.entries))):
+            return mask
+        return super()._lookup(key)
+
+
+async def search_impl(base_url: str, keywords: list[str]) -> Iterator[Entry]:
     """搜索"""
     entries = await get_entries(base_url)
-    return [
-        e
-        for e in entries
-        # 特殊类型匹配标题和类型名，其余只匹配标题
-        if match(
-            keywords,
-            [e.title, e.url.removesuffix("/").split("/")[-1]]
-            if e.kind in ["Function", "Type"]
-            else [e.title],
-        )
-    ]
+    return entries.search(keywords)
 
 
 search: SearchFn = search_impl
-"""根据 MiniSearch 索引搜索各级标题"""
+"""根据 typst 官方文档搜索标题，以及函数、类型的路径"""
+
+
+async def suggest_impl(base_url: str, keywords: list[str]) -> list[str]:
+    """纠正拼写"""
+    entries = await get_entries(base_url)
+    return entries.vocabulary.suggest(keywords)
 
 
-@alru_cache(ttl=timedelta(days=10).total_seconds())
-async def get_entries(base_url: str) -> list[Entry]:
-    return await get_search(base_url)
+suggest: SuggestFn = suggest_impl
+"""根据 typst 官方文档的标题和类型名纠正拼写"""
+
+
+@refreshing_cache(
+    ttl=timedelta(days=10).total_seconds(),
+    snapshot=Snapshot("typst_official_docs", version=5),
+    tracked=True,
+)
+async def get_entries(base_url: str) -> OfficialDocsIndex:
+    entries = await get_search(base_url)
+    # 建立索引较慢，放到线程中，以免阻塞事件循环
+    previous: OfficialDocsIndex | None = previous_value()
+    if previous is None:
+        return await asyncio.to_thread(OfficialDocsIndex, entries)
+    return await asyncio.to_thread(previous.updated, entries)
 
 
 async def get_search(base_url: str) -> list[Entry]:
-    """获取 search.json"""
+    """获取 search.json
+
+    若未改变，抛出`NotModified`。
+    """
     url = base_url + "/assets/search.json?bust=20230915"
-    async with httpx.AsyncClient() as client:
-        search = (await client.get(url)).text
+    search = (await get_if_modified(url)).text
+    return await asyncio.to_thread(parse_search, search)
+
+
+def parse_search(search: str) -> list[Entry]:
+    """解析 search.json"""
     items = json.loads(search)["items"]
-    return [Entry(kind=i["kind"], title=i["title"], url=i["route"]) for i in items]
+    return [
+        # 类型名只有几种，标题也多有重复（`Parameters`等）
+        Entry(kind=sys.intern(i["kind"]), title=sys.intern(i["title"]), url=i["route"])
+        for i in items
+    ]
@@ -2,10 +2,11 @@
 
 from datetime import timedelta
 
-import httpx
-from async_lru import alru_cache
 from bs4 import BeautifulSoup
 
+from faq_bot.shared.cache import refreshing_cache
+from faq_bot.shared.http import get_client
+
 
 async def handle(message: str) -> str:
     """回复消息"""
@@ -22,12 +23,13 @@ def as_url(package: str) -> str:
     return f"https://typst.app/universe/package/{package}"
 
 
-@alru_cache(ttl=timedelta(days=30).total_seconds())
+# `url` comes from user input, so bound the cache as `alru_cache` did.
+@refreshing_cache(ttl=timedelta(days=30).total_seconds(), maxsize=128)
 async def get_example(url: str) -> str | None:
     """Get the first example code of a package"""
 
-    async with httpx.AsyncClient() as client:
-        html = (await client.get(url)).text
+    client = get_client()
+    html = (await client.get(url)).text
     soup = BeautifulSoup(html, "html.parser")
     examples = soup.find_all("code", class_=["language-typ", "language-typst"])
     for example in examples:
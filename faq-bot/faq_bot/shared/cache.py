@@ -0,0 +1,273 @@
+"""可在后台刷新的异步缓存
+
+与`async_lru.alru_cache(ttl=…)`相比：过期后不会让下一位用户等待重新获取，而是先返回旧值，同时在后台刷新；刷新失败时继续使用旧值。
+
+刷新时，被缓存的函数可以：
+- 用`http.get_if_modified`发送条件请求，远程内容未改变时会抛出`NotModified`，直接沿用旧值；
+- 用`previous_value`取得旧值，据此增量更新。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import update_wrapper
+from typing import Any, Generic, ParamSpec, TypeVar
+
+from nonebot import logger
+
+from .http import NotModified, Validators, track_validators
+from .snapshot import Snapshot
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+@dataclass(slots=True)
+class _Slot(Generic[R]):
+    value: R
+    fetched_at: float
+    """获取`value`的时刻，按`time.monotonic`计"""
+    attempted_at: float
+    """最近一次尝试刷新的时刻，按`time.monotonic`计"""
+    validators: Validators = field(default_factory=dict)
+    """获取`value`时记录的 ETag、Last-Modified"""
+
+
+_previous: ContextVar[Any] = ContextVar("previous", default=None)
+
+
+def previous_value() -> Any:
+    """正在刷新的缓存的旧值；若在首次获取，或不在刷新过程中，返回`None`"""
+    return _previous.get()
+
+
+_generation = 0
+
+
+def generation() -> int:
+    """缓存值的版本号
+
+    任一`tracked`的缓存值改变时递增（远程内容未改变时不变）。由这些缓存值导出的结果可记下此值，据此判断是否过时。
+    """
+    return _generation
+
+
+def _bump_generation() -> None:
+    global _generation
+    _generation += 1
+
+
+class RefreshingCache(Generic[P, R]):
+    """可在后台刷新的异步缓存，用`refreshing_cache`构造"""
+
+    def __init__(
+        self,
+        fn: Callable[P, Awaitable[R]],
+        *,
+        ttl: float,
+        retry_interval: float,
+        snapshot: Snapshot[R] | None,
+        maxsize: int | None = None,
+        tracked: bool = False,
+    ) -> None:
+        update_wrapper(self, fn)
+        self.__wrapped__ = fn
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.snapshot = snapshot
+        self.maxsize = maxsize
+        self.tracked = tracked
+
+        self._slots: OrderedDict[Hashable, _Slot[R]] = OrderedDict()
+        """参数 ↦ 缓存值，最近使用的在最后"""
+        self._tasks: dict[Hashable, asyncio.Task[R]] = {}
+        """正在获取的值，避免同时重复获取"""
+
+    async def __call__(self, *args: P.args, **kwargs: P.kwargs) -> R:
+        key = _make_key(args, kwargs)
+        slot = self._slots.get(key)
+
+        if slot is None and (slot := await self._load_snapshot(key, args)) is not None:
+            # 先用快照，同时在后台重新验证
+            self._refresh(key, args, kwargs)
+            return slot.value
+
+        # 读取快照期间，其它调用者可能已存入
+        slot = self._slots.get(key)
+        if slot is None:
+            # 从未成功获取，只能等待
+            # shield: 即使调用者被取消，也继续获取，以免浪费
+            return await asyncio.shield(self._refresh(key, args, kwargs))
+
+        self._slots.move_to_end(key)
+        now = time.monotonic()
+        if (
+            now - slot.fetched_at > self.ttl
+            and now - slot.attempted_at > self.retry_interval
+        ):
+            # 已过期，先返回旧值，同时在后台刷新
+            slot.attempted_at = now
+            self._refresh(key, args, kwargs)
+
+        return slot.value
+
+    def _refresh(self, key: Hashable, args: tuple, kwargs: dict) -> asyncio.Task[R]:
+        """开始获取（若尚未开始）"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, args, kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    async def _fetch(self, key: Hashable, args: tuple, kwargs: dict) -> R:
+        started_at = time.monotonic()
+        slot = self._slots.get(key)
+        try:
+            # 本函数运行在单独的 task 中，设置的上下文变量不会影响调用者
+            _previous.set(slot.value if slot is not None else None)
+            with track_validators(
+                slot.validators if slot is not None else {}
+            ) as validators:
+                value = await self.__wrapped__(*args, **kwargs)
+        except NotModified:
+            if slot is None:
+                raise
+            slot.fetched_at = started_at
+            # 保留本次新得到的 ETag 等，例如先请求的其它文件改变了
+            slot.validators = validators
+            logger.info(
+                f"Revalidated {self.__wrapped__.__qualname__}{args} "
+                f"in {time.monotonic() - started_at:.1f} s, not modified."
+            )
+            return slot.value
+        except Exception as error:
+            if slot is not None:
+                logger.warning(
+                    f"Failed to refresh {self.__wrapped__.__qualname__}{args}, "
+                    f"keep using the value fetched {started_at - slot.fetched_at:.0f} s ago: {error!r}"
+                )
+                return slot.value
+            raise
+
+        self._store(
+            key,
+            _Slot(
+                value,
+                fetched_at=started_at,
+                attempted_at=started_at,
+                validators=validators,
+            ),
+        )
+        self._changed()
+        logger.info(
+            f"Refreshed {self.__wrapped__.__qualname__}{args} "
+            f"in {time.monotonic() - started_at:.1f} s."
+        )
+
+        if self.snapshot is not None:
+            try:
+                await asyncio.to_thread(self.snapshot.save, key, value, validators)
+            except Exception as error:  # noqa: BLE001 保存失败不影响本次获取的值
+                logger.warning(f"Failed to save the snapshot: {error!r}")
+
+        return value
+
+    async def _load_snapshot(self, key: Hashable, args: tuple) -> _Slot[R] | None:
+        """从快照恢复，并存入缓存
+
+        读取、解压、反序列化可能需要十几毫秒，放到线程中，以免阻塞事件循环。
+        若没有快照，或读取期间其它调用者已存入缓存（不覆盖），返回`None`。
+        """
+        if self.snapshot is None:
+            return None
+        loaded = await asyncio.to_thread(self.snapshot.load, key)
+        if loaded is None or key in self._slots:
+            return None
+
+        value, saved_at, validators = loaded
+        now = time.monotonic()
+        slot = _Slot(
+            value,
+            fetched_at=now - (time.time() - saved_at),
+            attempted_at=now,
+            validators=validators,
+        )
+        self._store(key, slot)
+        self._changed()
+        logger.info(
+            f"Loaded {self.__wrapped__.__qualname__}{args} from the snapshot "
+            f"saved {time.time() - saved_at:.0f} s ago."
+        )
+        return slot
+
+    def _changed(self) -> None:
+        """缓存值改变后调用"""
+        if self.tracked:
+            _bump_generation()
+
+    def _store(self, key: Hashable, slot: _Slot[R]) -> None:
+        """存入缓存，若超出`maxsize`则丢弃最久未用的"""
+        self._slots[key] = slot
+        self._slots.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._slots) > self.maxsize:
+                self._slots.popitem(last=False)
+
+    def age(self, *args: P.args, **kwargs: P.kwargs) -> float | None:
+        """缓存值的年龄（秒）；若尚无缓存，返回`None`"""
+        slot = self._slots.get(_make_key(args, kwargs))
+        if slot is None:
+            return None
+        return time.monotonic() - slot.fetched_at
+
+    def ages(self) -> dict[Hashable, float]:
+        """各个缓存值的年龄（秒）"""
+        now = time.monotonic()
+        return {key: now - slot.fetched_at for key, slot in self._slots.items()}
+
+    def cache_clear(self) -> None:
+        """清空缓存"""
+        self._slots.clear()
+        self._changed()
+
+
+def refreshing_cache(
+    *,
+    ttl: float,
+    retry_interval: float = 60,
+    snapshot: Snapshot[R] | None = None,
+    maxsize: int | None = None,
+    tracked: bool = False,
+) -> Callable[[Callable[P, Awaitable[R]]], RefreshingCache[P, R]]:
+    """缓存异步函数的结果，过期后在后台刷新
+
+    Args:
+        ttl: 缓存值的有效期（秒）。过期后再调用，会立即返回旧值，同时在后台刷新。
+        retry_interval: 刷新失败后，至少间隔多久（秒）再重试
+        snapshot: 若提供，每次获取成功后保存快照；重启后首次调用时先返回快照，同时在后台重新获取
+        maxsize: 最多缓存多少组参数的值，超出时丢弃最久未用的；`None`表示不限。参数来自用户输入时应当设置。
+        tracked: 缓存值改变时是否递增`generation()`。搜索索引应设置，以便清空由其导出的回复缓存；其余缓存不必，以免无谓地清空。
+
+    只有首次调用（尚无缓存值）时会等待获取；此时若获取失败，异常会传给调用者。
+    同一组参数同时至多获取一次。
+    """
+
+    def decorator(fn: Callable[P, Awaitable[R]]) -> RefreshingCache[P, R]:
+        return RefreshingCache(
+            fn,
+            ttl=ttl,
+            retry_interval=retry_interval,
+            snapshot=snapshot,
+            maxsize=maxsize,
+            tracked=tracked,
+        )
+
+    return decorator
+
+
+def _make_key(args: tuple, kwargs: dict) -> Hashable:
+    return (args, tuple(sorted(kwargs.items())))
@@ -0,0 +1,188 @@
+"""共享的 HTTP 客户端
+
+所有对外请求共用一个连接池，复用 TCP/TLS 连接（及 HTTP/2 多路复用），不必每次重新握手。
+在 NoneBot 启动时创建，关闭时释放。
+"""
+
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Final, TypeAlias
+
+import httpx
+from nonebot import get_driver, logger
+
+MAX_CONNECTIONS_PER_HOST: Final = 6
+"""每个主机的最大并发请求数
+
+从发出请求算起，直到响应体读完或关闭；重试前的等待不计在内。
+"""
+
+RETRY_STATUS_CODES: Final = frozenset({502, 503, 504})
+"""对 GET 请求，遇到这些状态码会重试"""
+
+_client: httpx.AsyncClient | None = None
+
+Validators: TypeAlias = dict[str, tuple[str | None, str | None]]
+"""URL ↦ (ETag, Last-Modified)"""
+
+_validators: ContextVar[Validators | None] = ContextVar("validators", default=None)
+
+
+class NotModified(Exception):
+    """远程内容自上次获取以来未改变（HTTP 304）"""
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """响应体；关闭时调用`release`（只调用一次）"""
+
+    def __init__(
+        self, stream: httpx.AsyncByteStream, release: Callable[[], None]
+    ) -> None:
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _Transport(httpx.AsyncBaseTransport):
+    """限制每个主机的并发数，并重试暂时的服务端错误"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, *, retries: int) -> None:
+        self._transport = transport
+        self._retries = retries
+        self._semaphores: defaultdict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphores[request.url.host]
+        for attempt in range(self._retries + 1):
+            await semaphore.acquire()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                semaphore.release()
+                raise
+
+            if (
+                request.method != "GET"
+                or response.status_code not in RETRY_STATUS_CODES
+                or attempt == self._retries
+            ):
+                # 直到响应体读完或关闭才释放，所以下载响应体也受限制
+                # （`httpx`读完响应体后会自动关闭）
+                assert isinstance(response.stream, httpx.AsyncByteStream)
+                response.stream = _ReleasingStream(response.stream, semaphore.release)
+                return response
+
+            try:
+                await response.aclose()
+            finally:
+                # 等待重试期间不占用名额
+                semaphore.release()
+            logger.warning(
+                f"Retrying {request.url} after {response.status_code} ({attempt + 1}/{self._retries})."
+            )
+            await asyncio.sleep(0.5 * 2**attempt)
+
+        raise AssertionError("unreachable")
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_client() -> httpx.AsyncClient:
+    """获取共享的客户端
+
+    不要用`async with`关闭它。若尚未创建（例如未启动 NoneBot 时），会自动创建。
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            transport=_Transport(
+                httpx.AsyncHTTPTransport(
+                    http2=True,
+                    # 仅重试连接失败
+                    retries=2,
+                    limits=httpx.Limits(
+                        max_connections=50,
+                        max_keepalive_connections=20,
+                        keepalive_expiry=60,
+                    ),
+                ),
+                retries=2,
+            ),
+            timeout=httpx.Timeout(15, connect=5),
+        )
+    return _client
+
+
+async def get_if_modified(url: str, **kwargs) -> httpx.Response:
+    """条件 GET
+
+    若在`track_validators`中调用，会附上此前记录的 ETag、Last-Modified，并记录新的值。
+    远程内容未改变时，抛出`NotModified`；其它错误状态码则抛出`httpx.HTTPStatusError`。
+    """
+    validators = _validators.get()
+
+    headers: dict[str, str] = {}
+    if validators is not None and url in validators:
+        etag, last_modified = validators[url]
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+
+    response = await get_client().get(url, headers=headers, **kwargs)
+    if response.status_code == httpx.codes.NOT_MODIFIED:
+        raise NotModified(url)
+    response.raise_for_status()
+
+    if validators is not None:
+        validators[url] = (
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+    return response
+
+
+@contextmanager
+def track_validators(previous: Validators) -> Iterator[Validators]:
+    """在此期间，`get_if_modified`使用`previous`，并把新值记录到返回的字典中"""
+    current = dict(previous)
+    token = _validators.set(current)
+    try:
+        yield current
+    finally:
+        _validators.reset(token)
+
+
+async def close_client() -> None:
+    """关闭共享的客户端"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+try:
+    driver = get_driver()
+except ValueError:
+    # 未初始化 NoneBot，例如在脚本中使用，此时按需创建客户端
+    pass
+else:
+    driver.on_startup(get_client)
+    driver.on_shutdown(close_client)
@@ -1,12 +1,22 @@
 from .by.mdbook_index import search as search_by_mdbook_index
+from .by.mdbook_index import suggest as suggest_by_mdbook_index
 from .by.minisearch_index import search as search_by_minisearch_index
+from .by.minisearch_index import suggest as suggest_by_minisearch_index
+from .by.sitemap_content import search as search_by_sitemap_content
+from .by.sitemap_content import suggest as suggest_by_sitemap_content
 from .by.sitemap_html import search as search_by_sitemap_html
+from .by.sitemap_html import suggest as suggest_by_sitemap_html
 from .handle import add_handler, build_handler
 
 __all__ = [
+    "add_handler",
+    "build_handler",
     "search_by_mdbook_index",
     "search_by_minisearch_index",
+    "search_by_sitemap_content",
     "search_by_sitemap_html",
-    "add_handler",
-    "build_handler",
+    "suggest_by_mdbook_index",
+    "suggest_by_minisearch_index",
+    "suggest_by_sitemap_content",
+    "suggest_by_sitemap_html",
 ]
@@ -1,13 +1,27 @@
 """搜索的抽象接口和相关通用工具"""
 
 from abc import abstractmethod
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Iterable
 from typing import Protocol, TypeAlias, TypeVar
 
 
 class AbstractEntry(Protocol):
+    __slots__ = ()
+    """允许子类使用`slots=True`，从而条目不必各带一个`__dict__`"""
+
     url: str
     """URL without base, starting with `/`"""
+    keys: tuple[str, ...]
+    """用于匹配的各个字段，已`tokenize.normalize`，首项为标题
+
+    应在构造条目时预先计算，搜索时不再重复计算。
+    """
+
+    @property
+    @abstractmethod
+    def depth(self) -> int:
+        """标题的层级，0 为最高级，用于排序"""
+        ...
 
     @abstractmethod
     def human(self) -> str:
@@ -16,17 +30,18 @@ class AbstractEntry(Protocol):
 
 
 T = TypeVar("T", bound=AbstractEntry, covariant=True)
-SearchFn: TypeAlias = Callable[[str, list[str]], Awaitable[list[T]]]
+SearchFn: TypeAlias = Callable[[str, list[str]], Awaitable[Iterable[T]]]
 """搜索
 
 (base URL, keywords) ↦ relevant entries
+
+结果可以是惰性的迭代器，由调用者排序、截取。
 """
 
+SuggestFn: TypeAlias = Callable[[str, list[str]], Awaitable[list[str]]]
+"""纠正拼写
 
-def match(keywords: list[str], documents: list[str]) -> bool:
-    """判断是否有某一`documents`包含某一`fragements`"""
-    for key in keywords:
-        for doc in documents:
-            if key.casefold() in doc.casefold():
-                return True
-    return False
+(base URL, keywords) ↦ suggested keywords
+
+若无法纠正，返回空列表。
+"""
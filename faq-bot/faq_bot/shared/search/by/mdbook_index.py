@@ -3,18 +3,23 @@
 https://rust-lang.github.io/mdBook
 """
 
-import json
-from collections.abc import Generator
-from dataclasses import dataclass
+import asyncio
+import sys
+from collections.abc import Generator, Iterator
+from dataclasses import dataclass, field
 from datetime import timedelta
 
-import httpx
-from async_lru import alru_cache
+from ...cache import previous_value, refreshing_cache
+from ...http import get_if_modified
+from ...snapshot import Snapshot
+from .. import partial_json
+from ..index import NgramIndex, build_index
+from ..tokenize import normalize
+from . import AbstractEntry, SearchFn, SuggestFn
 
-from . import AbstractEntry, SearchFn, match
 
-
-@dataclass
+# frozen: 可散列，以便增量更新索引时比较新旧条目
+@dataclass(slots=True, frozen=True)
 class Entry(AbstractEntry):
     url: str
     """URL without base, starting with `/`"""
@@ -22,36 +27,82 @@ class Entry(AbstractEntry):
     """`Fake italic & Text shadows`, etc."""
     breadcrumbs: str
     """`Typst Snippets » Text » Fake italic & Text shadows » Fake italic & Text shadows`, etc."""
+    keys: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # 只匹配标题
+        object.__setattr__(self, "keys", (normalize(self.title),))
+
+    @property
+    def depth(self) -> int:
+        return self.breadcrumbs.count(" » ")
 
     def human(self) -> str:
         return " - ".join([self.title, self.breadcrumbs])
 
 
-async def search_impl(base_url: str, keywords: list[str]) -> list[Entry]:
+async def search_impl(base_url: str, keywords: list[str]) -> Iterator[Entry]:
     """搜索"""
     entries = await get_entries(base_url)
-    # 只匹配标题
-    return [e for e in entries if match(keywords, [e.title])]
+    return entries.search(keywords)
 
 
 search: SearchFn = search_impl
 """根据 mdBook 网站的索引搜索各级标题"""
 
 
-@alru_cache(ttl=timedelta(days=3).total_seconds())
-async def get_entries(base_url: str) -> list[Entry]:
+async def suggest_impl(base_url: str, keywords: list[str]) -> list[str]:
+    """纠正拼写"""
+    entries = await get_entries(base_url)
+    return entries.vocabulary.suggest(keywords)
+
+
+suggest: SuggestFn = suggest_impl
+"""根据 mdBook 网站的各级标题纠正拼写"""
+
+
+@refreshing_cache(
+    ttl=timedelta(days=3).total_seconds(),
+    snapshot=Snapshot("mdbook_index", version=4),
+    tracked=True,
+)
+async def get_entries(base_url: str) -> NgramIndex[Entry]:
     index = await get_search_index(base_url)
-    return list(parse_search_index(index))
+    # 解析、建立索引都较慢，放到线程中，以免阻塞事件循环
+    return await asyncio.to_thread(
+        build_index, parse_search_index(index), previous_value()
+    )
 
 
 async def get_search_index(base_url: str) -> dict:
-    """获取索引"""
+    """获取索引
+
+    若索引未改变，抛出`NotModified`。
+    """
     assert not base_url.endswith("/")
 
-    async with httpx.AsyncClient() as client:
-        search_index = (await client.get(f"{base_url}/searchindex.json")).text
+    search_index = (await get_if_modified(f"{base_url}/searchindex.json")).text
+
+    return await asyncio.to_thread(load_search_index, search_index)
 
-    return json.loads(search_index)
+
+def load_search_index(search_index: str) -> dict:
+    """解析 searchindex.json 中`parse_search_index`用到的部分
+
+    跳过 elasticlunr 的倒排索引和各节正文，它们占文件的大部分，解析后的内存占用更是数倍于此。
+    """
+    return partial_json.loads(
+        search_index,
+        {
+            "doc_urls": True,
+            "index": {
+                "documentStore": {
+                    "docs": {"*": {"title": True, "breadcrumbs": True}},
+                    "length": True,
+                }
+            },
+        },
+    )
 
 
 def parse_search_index(index: dict) -> Generator[Entry]:
@@ -64,6 +115,6 @@ def parse_search_index(index: dict) -> Generator[Entry]:
     for id_, doc in index["index"]["documentStore"]["docs"].items():
         yield Entry(
             url=index["doc_urls"][int(id_)],
-            breadcrumbs=doc["breadcrumbs"],
-            title=doc["title"],
+            breadcrumbs=sys.intern(doc["breadcrumbs"]),
+            title=sys.intern(doc["title"]),
         )
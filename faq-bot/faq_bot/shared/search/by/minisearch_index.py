@@ -4,88 +4,268 @@ https://vitepress.dev
 https://lucaong.github.io/minisearch
 """
 
+import asyncio
 import json
 import re
-from collections.abc import Generator
-from dataclasses import dataclass
+import sys
+from collections.abc import Generator, Iterable, Iterator
+from dataclasses import dataclass, field
 from datetime import timedelta
+from typing import Final
 
 import httpx
-from async_lru import alru_cache
+from nonebot import logger
 
-from . import AbstractEntry, SearchFn, match
+from ...cache import previous_value, refreshing_cache
+from ...http import NotModified, get_client, get_if_modified
+from ...snapshot import Snapshot
+from .. import partial_json
+from ..index import NgramIndex
+from ..prefix import PrefixIndex
+from ..tokenize import normalize
+from . import AbstractEntry, SearchFn, SuggestFn
 
+MIN_PREFIX_LENGTH: Final = 2
+"""按词项前缀匹配的最短关键词；更短的前缀几乎匹配所有正文"""
 
-@dataclass
+_search_index_urls: Final = Snapshot[tuple[str, str]]("minisearch_index_url", version=2)
+"""base URL ↦ 上次找到的 (`theme.*.js`的 URL, `@localSearchIndexroot.*.js`的 URL)"""
+
+
+# frozen: 可散列，以便增量更新索引时比较新旧条目
+@dataclass(slots=True, frozen=True)
 class Entry(AbstractEntry):
     url: str
     """URL without base, starting with `/`"""
     title: str
-    titles: list[str]
+    titles: tuple[str, ...]
     """从高级标题到低级标题，不含`title`，可能为空"""
+    keys: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # 顶级标题匹配标题和 URL，其余只匹配标题
+        keys = (
+            (normalize(self.title),)
+            if self.titles
+            else (normalize(self.title), normalize(self.url))
+        )
+        object.__setattr__(self, "keys", keys)
+
+    @property
+    def depth(self) -> int:
+        return len(self.titles)
 
     def human(self) -> str:
         return " - ".join([self.title, *reversed(self.titles)])
 
 
-async def search_impl(base_url: str, keywords: list[str]) -> list[Entry]:
+class MiniSearchIndex(NgramIndex[Entry]):
+    """匹配各级标题；若无结果，再匹配 MiniSearch 索引中以关键词开头的词项（包括正文中的词）
+
+    词项取自网站预先建立的倒排索引，不必自己抓取、切分正文。
+    正文中的常见词会命中大量条目，所以只在标题无结果时才用，以免排序时要比较的条目太多。
+    """
+
+    __slots__ = ("terms",)
+
+    def __init__(self, entries: Iterable[Entry], *, n: int = 2) -> None:
+        super().__init__(entries, n=n)
+        self.terms = PrefixIndex([])
+        """MiniSearch 的词项 ↦ 条目序号，由`build_search_index`设置"""
+
+    def _mask(self, keywords: list[str]) -> int:
+        if mask := super()._mask(keywords):
+            return mask
+
+        for key in map(normalize, keywords):
+            if len(key) >= MIN_PREFIX_LENGTH:
+                mask |= self.terms.lookup(key, len(self.entries))
+        return mask
+
+
+async def search_impl(base_url: str, keywords: list[str]) -> Iterator[Entry]:
     """搜索"""
     entries = await get_entries(base_url)
-    return [
-        e
-        for e in entries
-        # 顶级标题匹配标题和 URL，其余只匹配标题
-        if match(keywords, [e.title] if e.titles else [e.title, e.url])
-    ]
+    return entries.search(keywords)
 
 
 search: SearchFn = search_impl
-"""根据 VitePress 网站的 MiniSearch 索引搜索各级标题"""
+"""根据 VitePress 网站的 MiniSearch 索引搜索各级标题和正文"""
+
+
+async def suggest_impl(base_url: str, keywords: list[str]) -> list[str]:
+    """纠正拼写"""
+    entries = await get_entries(base_url)
+    return entries.vocabulary.suggest(keywords)
 
 
-@alru_cache(ttl=timedelta(days=3).total_seconds())
-async def get_entries(base_url: str) -> list[Entry]:
+suggest: SuggestFn = suggest_impl
+"""根据 VitePress 网站的各级标题和 URL 纠正拼写"""
+
+
+@refreshing_cache(
+    ttl=timedelta(days=3).total_seconds(),
+    snapshot=Snapshot("minisearch_index", version=5),
+    tracked=True,
+)
+async def get_entries(base_url: str) -> MiniSearchIndex:
     index = await get_search_index(base_url)
-    return list(parse_search_index(base_url, index))
+    # 解析、建立索引都较慢，放到线程中，以免阻塞事件循环
+    return await asyncio.to_thread(
+        build_search_index, base_url, index, previous_value()
+    )
 
 
 async def get_search_index(base_url: str) -> dict:
     """获取 MiniSearch 索引
 
     https://lucaong.github.io/minisearch/
+
+    VitePress 的文件名含内容的哈希，索引改变时，VPLocalSearchBox、theme 的文件名依次随之改变。
+    所以若找到过索引文件，只需条件请求 HTML：若未改变（304），或引用的 theme 与上次相同，
+    就直接请求上次找到的索引文件，共两个请求；否则，或索引文件已消失（404、410），再重新查找。
+    若索引未改变，抛出`NotModified`。
     """
     assert not base_url.endswith("/")
+
+    known = await asyncio.to_thread(_search_index_urls.load, base_url)
+    known_urls = known[0] if known is not None else None
+
+    # 条件请求也会记录 HTML 的 ETag 等，供下次使用
+    theme_url = await find_theme_url(base_url, conditional=True)
+    if known_urls is not None:
+        known_theme_url, search_index_url = known_urls
+        if theme_url in {None, known_theme_url}:
+            try:
+                return await fetch_search_index(search_index_url)
+            except httpx.HTTPStatusError as error:
+                if error.response.status_code not in {404, 410}:
+                    raise
+                logger.info(
+                    f"Rediscovering the search index of {base_url} "
+                    f"because {search_index_url} is gone."
+                )
+        else:
+            logger.info(
+                f"Rediscovering the search index of {base_url} "
+                f"because the theme has changed to {theme_url}."
+            )
+
+    if theme_url is None:
+        theme_url = await find_theme_url(base_url, conditional=False)
+        assert theme_url is not None
+    search_index_url = await discover_search_index_url(base_url, theme_url)
+    await asyncio.to_thread(
+        _search_index_urls.save, base_url, (theme_url, search_index_url), {}
+    )
+    return await fetch_search_index(search_index_url)
+
+
+async def find_theme_url(base_url: str, *, conditional: bool) -> str | None:
+    """请求 HTML，找到`theme.*.js`的 URL
+
+    若`conditional`，则发送条件请求；HTML 未改变时，返回`None`。
+    """
+    # 带上末尾的`/`，以免多一次重定向
+    if conditional:
+        try:
+            response = await get_if_modified(f"{base_url}/", follow_redirects=True)
+        except NotModified:
+            return None
+    else:
+        response = await get_client().get(f"{base_url}/", follow_redirects=True)
+
     parsed = httpx.URL(base_url)
     root = parsed.path.removesuffix("/")
+    m = re.search(rf'href="({root}/assets/chunks/theme\.[-\w]+\.js)"', response.text)
+    assert m is not None
+    return str(parsed.copy_with(path=m.group(1)))
 
-    async with httpx.AsyncClient() as client:
-        index_html = (await client.get(base_url, follow_redirects=True)).text
-        m = re.search(rf'href="({root}/assets/chunks/theme\.[-\w]+\.js)"', index_html)
-        assert m is not None
-        theme_url = parsed.copy_with(path=m.group(1))
 
-        theme_js = (await client.get(theme_url)).text
-        m = re.search(r'"(assets/chunks/VPLocalSearchBox\.[-\w]+\.js)"', theme_js)
-        assert m is not None
-        search_box_url = f"{base_url}/{m.group(1)}"
+async def discover_search_index_url(base_url: str, theme_url: str) -> str:
+    """依次请求 theme → VPLocalSearchBox，找到`@localSearchIndexroot.*.js`的 URL"""
+    client = get_client()
+    theme_js = (await client.get(theme_url)).text
+    m = re.search(r'"(assets/chunks/VPLocalSearchBox\.[-\w]+\.js)"', theme_js)
+    assert m is not None
+    search_box_url = f"{base_url}/{m.group(1)}"
 
-        search_box_js = (await client.get(search_box_url)).text
-        m = re.search(
-            r'import\("\.(/@localSearchIndexroot\.[-\w]+\.js)"\)', search_box_js
-        )
-        assert m is not None
-        search_index_url = f"{base_url}/assets/chunks{m.group(1)}"
-
-        search_index_js = (await client.get(search_index_url)).text
-        search_index = (
-            search_index_js.strip()
-            .removeprefix("const t=`")
-            .removeprefix("const t='")
-            .removesuffix("';export{t as default};")
-            .removesuffix("`;export{t as default};")
-            .replace(R"\`", "`")
-        )
-    return json.loads(search_index)
+    search_box_js = (await client.get(search_box_url)).text
+    m = re.search(r'import\("\.(/@localSearchIndexroot\.[-\w]+\.js)"\)', search_box_js)
+    assert m is not None
+    return f"{base_url}/assets/chunks{m.group(1)}"
+
+
+async def fetch_search_index(search_index_url: str) -> dict:
+    """获取并解析`@localSearchIndexroot.*.js`
+
+    文件名含内容的哈希，所以若网站未更新，通常会得到 304，抛出`NotModified`。
+    """
+    search_index_js = (await get_if_modified(search_index_url)).text
+    return await asyncio.to_thread(parse_search_index_js, search_index_js)
+
+
+def _document_ids(pairs: list[tuple[str, object]]) -> tuple[str, ...]:
+    """把倒排索引中的`{字段序号: {文档序号: 词频}}`化简为文档序号
+
+    内层对象先解析，所以遇到外层对象时，其值已是文档序号的元组。
+    """
+    if pairs and isinstance(pairs[0][1], tuple):
+        return tuple({id_: None for _, ids in pairs for id_ in ids})
+    return tuple(k for k, _ in pairs)
+
+
+_postings_decoder: Final = json.JSONDecoder(object_pairs_hook=_document_ids)
+"""解析 MiniSearch 的倒排索引`[[词项, {字段序号: {文档序号: 词频}}], …]`为`[[词项, 文档序号], …]`"""
+
+
+def parse_search_index_js(search_index_js: str) -> dict:
+    """从`@localSearchIndexroot.*.js`中取出 MiniSearch 索引中用到的部分
+
+    倒排索引占文件的大部分，解析时只保留各词项所在的文档，略去字段和词频。
+    直接从 JS 中间开始解析，不复制整个文件。
+    """
+    if R"\`" in search_index_js:
+        # 仅当模板字符串中有转义的反引号时，才需要复制一份来替换
+        search_index_js = search_index_js.replace(R"\`", "`")
+    return partial_json.loads(
+        search_index_js,
+        {
+            "documentCount": True,
+            "documentIds": True,
+            "storedFields": True,
+            "index": _postings_decoder,
+            "serializationVersion": True,
+        },
+        # `const t=`…`;export{t as default};`或`const t='…';export{t as default};`
+        start=search_index_js.index("{"),
+    )
+
+
+def build_search_index(
+    base_url: str, index: dict, previous: MiniSearchIndex | None
+) -> MiniSearchIndex:
+    """建立索引；若有旧索引，则在其基础上增量更新标题部分，词项部分总是重建"""
+    # 文档序号 ↦ 条目
+    documents = dict(zip(index["storedFields"], parse_search_index(base_url, index)))
+    if previous is None:
+        built = MiniSearchIndex(documents.values())
+    else:
+        built = previous.updated(documents.values())
+
+    # 增量更新后，条目的序号与在`documents`中的顺序不一定相同
+    ids: dict[Entry, int] = {}
+    for id_, e in enumerate(built.entries):
+        if e is not None:
+            ids.setdefault(e, id_)
+    document_ids = {doc: ids[e] for doc, e in documents.items()}
+
+    built.terms = PrefixIndex(
+        # 已删除的文档可能仍留在倒排索引中
+        (normalize(term), (document_ids[d] for d in docs if d in document_ids))
+        for term, docs in index["index"]
+    )
+    return built
 
 
 def parse_search_index(base_url: str, index: dict) -> Generator[Entry]:
@@ -104,4 +284,9 @@ def parse_search_index(base_url: str, index: dict) -> Generator[Entry]:
         if not value["titles"]:
             url = str(httpx.URL(url).copy_with(fragment=None))
 
-        yield Entry(url=url, **value)
+        yield Entry(
+            url=url,
+            title=sys.intern(value["title"]),
+            # 上级标题在同一页面的各条目中反复出现
+            titles=tuple(map(sys.intern, value["titles"])),
+        )
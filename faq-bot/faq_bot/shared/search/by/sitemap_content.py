@@ -0,0 +1,161 @@
+"""根据 /sitemap.html 所列网页的正文全文搜索
+
+定期抓取各个网页，在本地建立全文索引，搜索时不必再访问网站。
+"""
+
+import asyncio
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+from typing import Final
+
+import httpx
+from bs4 import BeautifulSoup
+from nonebot import logger
+
+from ...cache import previous_value, refreshing_cache
+from ...http import NotModified, get_client, get_if_modified
+from ...snapshot import Snapshot
+from ..index import NgramIndex
+from ..tokenize import normalize
+from . import AbstractEntry, SearchFn, SuggestFn
+from .sitemap_html import get_sitemap
+
+MAX_CONCURRENT_PAGES: Final = 4
+"""同时抓取的最大网页数"""
+
+
+# frozen: 可散列，以便增量更新索引时比较新旧条目
+@dataclass(slots=True, frozen=True)
+class Entry(AbstractEntry):
+    url: str
+    title: str
+    text: bytes = field(repr=False)
+    """zlib 压缩的正文，已`normalize`"""
+    keys: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # 排序时只看标题和 URL；正文由`ContentIndex`另行匹配
+        object.__setattr__(self, "keys", (normalize(self.title), normalize(self.url)))
+
+    @property
+    def depth(self) -> int:
+        # 只有一级标题
+        return 0
+
+    def human(self) -> str:
+        return self.title
+
+
+class ContentIndex(NgramIndex[Entry]):
+    """匹配标题、URL 和正文的索引
+
+    正文以压缩形式保存，只在建立索引和验证候选条目时解压。
+    """
+
+    __slots__ = ()
+
+    def _fields(self, entry: Entry) -> Iterable[str]:
+        return (*entry.keys, zlib.decompress(entry.text).decode())
+
+
+async def search_impl(base_url: str, keywords: list[str]) -> Iterator[Entry]:
+    """搜索"""
+    entries = await get_entries(base_url)
+    return entries.search(keywords)
+
+
+search: SearchFn = search_impl
+"""根据 /sitemap.html 所列网页的正文全文搜索"""
+
+
+async def suggest_impl(base_url: str, keywords: list[str]) -> list[str]:
+    """纠正拼写"""
+    entries = await get_entries(base_url)
+    return entries.vocabulary.suggest(keywords)
+
+
+suggest: SuggestFn = suggest_impl
+"""根据 /sitemap.html 中的一级标题和 URL 纠正拼写"""
+
+
+@refreshing_cache(
+    ttl=timedelta(days=1).total_seconds(),
+    snapshot=Snapshot("sitemap_content", version=4),
+    tracked=True,
+)
+async def get_entries(base_url: str) -> ContentIndex:
+    """抓取全部网页并建立索引
+
+    只重新抓取 ETag 或 Last-Modified 改变了的网页；正文未改变的网页也不会重新索引。
+    若网站地图和各网页都未改变，抛出`NotModified`。
+    """
+    previous: ContentIndex | None = previous_value()
+    old_entries = (
+        {e.url: e for e in previous.entries if e is not None}
+        if previous is not None
+        else {}
+    )
+
+    try:
+        sitemap = await get_sitemap(base_url)
+        sitemap_modified = True
+    except NotModified:
+        sitemap = [(e.url, e.title) for e in old_entries.values()]
+        sitemap_modified = False
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+    entries = await asyncio.gather(
+        *(
+            fetch_page(base_url, url, title, old_entries.get(url), semaphore)
+            for url, title in sitemap
+        )
+    )
+
+    fetched = [e for e in entries if e is not None]
+    if not sitemap_modified and set(fetched) == set(old_entries.values()):
+        raise NotModified(base_url)
+
+    # 建立索引较慢，放到线程中，以免阻塞事件循环
+    if previous is None:
+        return await asyncio.to_thread(ContentIndex, fetched)
+    return await asyncio.to_thread(previous.updated, fetched)
+
+
+async def fetch_page(
+    base_url: str,
+    url: str,
+    title: str,
+    old: Entry | None,
+    semaphore: asyncio.Semaphore,
+) -> Entry | None:
+    """抓取网页
+
+    若网页未改变，返回`old`（必要时更新标题）；若抓取失败，也返回`old`。
+    """
+    async with semaphore:
+        try:
+            try:
+                response = await get_if_modified(f"{base_url}{url}")
+            except NotModified:
+                if old is not None:
+                    return old if old.title == title else replace(old, title=title)
+                # 记录的 ETag 对应的内容已被丢弃（例如网页曾从网站地图中删除），只能完整获取
+                response = await get_client().get(f"{base_url}{url}")
+                response.raise_for_status()
+        except httpx.HTTPError as error:
+            logger.warning(f"Failed to fetch {base_url}{url}: {error!r}")
+            return old
+
+    text = await asyncio.to_thread(extract_text, response.text)
+    return Entry(url=url, title=title, text=text)
+
+
+def extract_text(html: str) -> bytes:
+    """提取正文，`normalize`并压缩"""
+    soup = BeautifulSoup(html, "html.parser")
+    # VitePress 的正文在`.vp-doc`中，其余为导航栏、侧边栏等
+    main = soup.select_one(".vp-doc") or soup.find("main") or soup
+    text = main.get_text(" ", strip=True)
+    return zlib.compress(normalize(text).encode(), level=9)
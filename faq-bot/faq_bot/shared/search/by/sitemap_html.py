@@ -1,46 +1,79 @@
 """根据 /sitemap.html 搜索一级标题和 URL"""
 
-from collections.abc import Generator
-from dataclasses import dataclass
+import asyncio
+from collections.abc import Generator, Iterator
+from dataclasses import dataclass, field
 from datetime import timedelta
 
-import httpx
-from async_lru import alru_cache
+from ...cache import previous_value, refreshing_cache
+from ...http import get_if_modified
+from ...snapshot import Snapshot
+from ..index import NgramIndex, build_index
+from ..tokenize import normalize
+from . import AbstractEntry, SearchFn, SuggestFn
 
-from . import AbstractEntry, SearchFn, match
 
-
-@dataclass
+# frozen: 可散列，以便增量更新索引时比较新旧条目
+@dataclass(slots=True, frozen=True)
 class Entry(AbstractEntry):
     url: str
     title: str
+    keys: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "keys", (normalize(self.title), normalize(self.url)))
+
+    @property
+    def depth(self) -> int:
+        # 只有一级标题
+        return 0
 
     def human(self) -> str:
         return self.title
 
 
-async def search_impl(base_url: str, keywords: list[str]) -> list[Entry]:
+async def search_impl(base_url: str, keywords: list[str]) -> Iterator[Entry]:
     """搜索"""
-    sitemap = await get_sitemap(base_url)
-    return [
-        Entry(url=url, title=title)
-        for url, title in sitemap
-        if match(keywords, [url, title])
-    ]
+    entries = await get_entries(base_url)
+    return entries.search(keywords)
 
 
 search: SearchFn = search_impl
 """根据 /sitemap.html 搜索一级标题和 URL"""
 
 
-@alru_cache(ttl=timedelta(days=3).total_seconds())
+async def suggest_impl(base_url: str, keywords: list[str]) -> list[str]:
+    """纠正拼写"""
+    entries = await get_entries(base_url)
+    return entries.vocabulary.suggest(keywords)
+
+
+suggest: SuggestFn = suggest_impl
+"""根据 /sitemap.html 中的一级标题和 URL 纠正拼写"""
+
+
+@refreshing_cache(
+    ttl=timedelta(days=3).total_seconds(),
+    snapshot=Snapshot("sitemap_html", version=4),
+    tracked=True,
+)
+async def get_entries(base_url: str) -> NgramIndex[Entry]:
+    sitemap = await get_sitemap(base_url)
+    # 建立索引较慢，放到线程中，以免阻塞事件循环
+    return await asyncio.to_thread(
+        build_index,
+        (Entry(url=url, title=title) for url, title in sitemap),
+        previous_value(),
+    )
+
+
 async def get_sitemap(base_url: str) -> list[tuple[str, str]]:
     """获取网站地图
 
     返回格式为 (URL, 标题)[]。注意为方便搜索，URL 以`/`开头，不带`BASE_URL`。
+    若网站地图未改变，抛出`NotModified`。
     """
-    async with httpx.AsyncClient() as client:
-        sitemap_html = (await client.get(f"{base_url}/sitemap.html")).text
+    sitemap_html = (await get_if_modified(f"{base_url}/sitemap.html")).text
     return list(parse_sitemap_html(sitemap_html))
 
 
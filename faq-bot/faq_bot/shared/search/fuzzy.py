@@ -0,0 +1,191 @@
+"""纠正拼写
+
+精确搜索无结果时，在词汇表中寻找与关键词相近的词，提示“你是不是要找……”。
+
+先用 bigram 倒排索引找出候选词，再按相同 bigram 的数量过滤，只对剩下的少数候选词计算编辑距离，
+不必逐一比较整个词汇表。
+"""
+
+import re
+from collections import Counter
+from collections.abc import Iterable
+from copy import copy
+from typing import Final
+
+from .tokenize import normalize
+
+MIN_LENGTH: Final = 3
+"""参与纠正的最短词长；更短的词容易误纠正"""
+
+MAX_SUGGESTIONS: Final = 3
+"""每个关键词最多给出几个建议"""
+
+_SEPARATORS: Final = re.compile(r"[\s\-_/.,:;()#]+")
+
+
+def bigrams(word: str) -> set[str]:
+    """首尾补空格后的全部 bigram，使首尾字符也各占两个 bigram"""
+    padded = f" {word} "
+    return {padded[i : i + 2] for i in range(len(padded) - 1)}
+
+
+def max_distance(word: str) -> int:
+    """允许的最大编辑距离"""
+    return 1 if len(word) <= 4 else 2
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """编辑距离（相邻字符交换算一次编辑）；若超过`limit`，返回`limit + 1`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # 只保留最近三行
+    before_previous: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+
+    return min(previous[-1], limit + 1)
+
+
+def terms_of(key: str) -> set[str]:
+    """key 本身及其中按空格、连字符等拆开的各个词，不含过短的"""
+    return {t for t in [key, *_SEPARATORS.split(key)] if len(t) >= MIN_LENGTH}
+
+
+class Vocabulary:
+    """词汇表
+
+    包括条目的各个匹配字段，以及其中按空格、连字符等拆开的各个词，均已`normalize`。
+    """
+
+    __slots__ = ("_counts", "_ids", "_postings", "terms")
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        """
+        Args:
+            keys: 全部条目的`keys`
+        """
+        self.terms: list[str | None] = []
+        """各个词；删除的词留下空位`None`"""
+        self._ids: dict[str, int] = {}
+        """词 ↦ 在`terms`中的序号"""
+        self._counts: Counter[str] = Counter()
+        """词 ↦ 含它的 key 的个数"""
+        self._postings: dict[str, set[int]] = {}
+        """bigram ↦ 包含它的词的序号"""
+
+        self._update(keys, [], fresh=set())
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def updated(self, added: Iterable[str], removed: Iterable[str]) -> "Vocabulary":
+        """按增加、删除的 key 更新，返回新词汇表，本词汇表不变
+
+        只有首次出现、不再出现的词需要修改倒排索引，不必重建。
+        删除的词留下的空位不再使用，不过空位太多时，`NgramIndex.updated`会整个重建。
+        """
+        vocabulary = copy(self)
+        vocabulary.terms = self.terms.copy()
+        vocabulary._ids = self._ids.copy()
+        vocabulary._counts = self._counts.copy()
+        vocabulary._postings = self._postings.copy()
+        vocabulary._update(added, removed, fresh=set())
+        return vocabulary
+
+    def _update(
+        self, added: Iterable[str], removed: Iterable[str], *, fresh: set[str]
+    ) -> None:
+        """
+        Args:
+            fresh: 已复制、不再与旧词汇表共用的`_postings`中的集合
+        """
+        for k in removed:
+            for t in terms_of(k):
+                self._counts[t] -= 1
+                if self._counts[t] == 0:
+                    del self._counts[t]
+                    self._remove(t, fresh)
+        for k in added:
+            for t in terms_of(k):
+                self._counts[t] += 1
+                if self._counts[t] == 1:
+                    self._add(t, fresh)
+
+    def _posting(self, g: str, fresh: set[str]) -> set[int]:
+        """可以修改的`_postings[g]`，必要时先复制（写时复制）"""
+        if g not in fresh:
+            self._postings[g] = set(self._postings.get(g, ()))
+            fresh.add(g)
+        return self._postings[g]
+
+    def _add(self, term: str, fresh: set[str]) -> None:
+        id_ = len(self.terms)
+        self.terms.append(term)
+        self._ids[term] = id_
+        for g in bigrams(term):
+            self._posting(g, fresh).add(id_)
+
+    def _remove(self, term: str, fresh: set[str]) -> None:
+        id_ = self._ids.pop(term)
+        self.terms[id_] = None
+        for g in bigrams(term):
+            ids = self._posting(g, fresh)
+            ids.discard(id_)
+            if not ids:
+                del self._postings[g]
+                fresh.discard(g)
+
+    def similar(self, word: str) -> list[str]:
+        """与`word`最相近的若干词，`word`已`normalize`；若没有足够相近的，返回空列表"""
+        if len(word) < MIN_LENGTH:
+            return []
+        limit = max_distance(word)
+
+        own = bigrams(word)
+        shared = Counter(id_ for g in own for id_ in self._postings.get(g, ()))
+
+        # 计数过滤：每次插入、删除、替换至多破坏 2 个 bigram，相邻交换至多 3 个，
+        # 所以编辑距离不超过 k 的两词至少有 max(|A|, |B|) − 3k 个相同的 bigram（A、B 为两词的 bigram 集合）。
+        # 按相同的个数从多到少检查，先找到的近词会收紧 k，其后的候选词大多不必计算编辑距离。
+        best = limit + 1
+        found: list[tuple[int, str]] = []
+        for id_, n_shared in shared.most_common():
+            k = min(limit, best)
+            if n_shared < len(own) - 3 * k:
+                break
+            term = self.terms[id_]
+            assert term is not None
+            if n_shared < len(bigrams(term)) - 3 * k:
+                continue
+
+            d = distance(word, term, k)
+            if d < best:
+                best = d
+                found = [(n_shared, term)]
+            elif d == best and d <= limit:
+                found.append((n_shared, term))
+
+        # 距离相同时，相同的 bigram 多者优先，再按字母顺序
+        found.sort(key=lambda x: (-x[0], x[1]))
+        return [term for _, term in found[:MAX_SUGGESTIONS] if term != word]
+
+    def suggest(self, keywords: list[str]) -> list[str]:
+        """纠正各个关键词，返回去重后的建议；若都无法纠正，返回空列表"""
+        suggestions: dict[str, None] = {}
+        for k in keywords:
+            suggestions.update(dict.fromkeys(self.similar(normalize(k))))
+        return list(suggestions)
@@ -1,17 +1,28 @@
 # from ast import TypeAlias
-from collections.abc import Awaitable, Callable
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from functools import partial
 from itertools import repeat
+from typing import Literal, TypeVar
 
+from nonebot import logger
 from nonebot.adapters import Message
 from nonebot.adapters.onebot.v11 import Bot, MessageEvent
 from nonebot.matcher import Matcher
 from nonebot.params import CommandArg
 
-from faq_bot.shared.search.by import SearchFn
+from faq_bot.shared import warmup
+from faq_bot.shared.cache import generation
+from faq_bot.shared.search.by import AbstractEntry, SearchFn, SuggestFn
+from faq_bot.shared.search.rank import normalize_keywords, score, top_k
+from faq_bot.shared.search.reply_cache import ReplyCache
+from faq_bot.shared.search.tokenize import fragments, tokenize
 
 Handler = Callable[[str], Awaitable[str]]
 """回复消息"""
 
+T = TypeVar("T")
+
 
 def check_base_url(v: str) -> None:
     assert v.startswith("https://")
@@ -24,18 +35,34 @@ def build_handler(
     methods: list[SearchFn],
     if_no_result: str,
     max_n_results: int = 5,
+    mode: Literal["sequential", "concurrent", "merged"] = "sequential",
+    source_timeout: float = 5,
+    reply_cache_size: int = 128,
+    suggest_methods: list[SuggestFn] | None = None,
 ) -> Handler:
     """构造回复消息的方法
 
     Args:
         base_url: Base URL (e.g. a VitePress site), without a trailing slash
-        methods: 一系列搜索方法；从前向后依次调用，直至首个有结果的
+        methods: 一系列搜索方法；从前向后依次调用，直至首个有结果的（只命中切出的相邻两字的不算，见`choose`）
         if_no_result: 搜索完全无结果时的回复
         max_n_results: 回复中搜索结果的最大数量
+        mode: 执行方式。
+            `"sequential"`: 依次调用，前面的方法有结果就不再调用后面的。
+            `"concurrent"`: 同时调用所有方法，但仍采用最靠前的有结果的方法；一旦确定，就取消其余方法。
+            适合缓存尚未建立、各方法都需联网的情形。两种方式的回复完全相同。
+            `"merged"`: 同时调用所有方法，合并各方法的结果，去除 URL 重复者，再统一按相关程度选取。
+            相关程度相同时，靠前的方法优先。超时或出错的方法视为无结果。
+        source_timeout: 仅用于`"merged"`，每种方法（及其纠正拼写的方法）最多等待多久（秒），以免个别慢的来源拖延回复
+        reply_cache_size: 缓存多少条回复，详见`ReplyCache`；0 表示不缓存
+        suggest_methods: 纠正拼写的方法，与`methods`对应。
+            若所有`methods`都无结果，则从前向后依次调用，用首个给出的建议重新搜索，并在回复开头提示“你是不是要找……”。
+
+    搜索结果按相关程度排序，只保留最相关的`max_n_results`个，详见`rank.score`。
 
     若只提供单个`base_url`，则用于所有`methods`；若提供多个`base_url`，则与`methods`对应使用。
 
-    注意，回复中无论包含多少搜索结果，这些结果都必然仅是`methods`中某一种方法的结果，不可能是多种方法结果的混合。
+    注意，除`"merged"`外，回复中无论包含多少搜索结果，这些结果都必然仅是`methods`中某一种方法的结果，不可能是多种方法结果的混合。
     """
     # Check and normalize `base_url` to `base_urls`
     if isinstance(base_url, list):
@@ -47,21 +74,202 @@ def build_handler(
         check_base_url(base_url)
         base_urls = repeat(base_url)
 
-    async def handle(message: str) -> str:
-        keywords = message.split()
-
-        # Search until first match
-        for base, search in zip(base_urls, methods):
-            relevant = await search(base, keywords)
-            if relevant:
-                reply = "\n\n".join(
-                    f"{e.human()}\n{base}{e.url}" for e in relevant[:max_n_results]
+    if suggest_methods is not None:
+        assert len(suggest_methods) == len(methods)
+
+    # 启动时预先加载各个索引；空关键词不会匹配任何条目，只是触发加载
+    for base, search in zip(base_urls, methods):
+        warmup.register(f"{search.__module__} {base}", partial(search, base, []))
+
+    async def lookup(
+        base: str, search: SearchFn, keywords: list[str]
+    ) -> tuple[list[AbstractEntry], int]:
+        return top_k(await search(base, keywords), keywords, max_n_results)
+
+    def format_reply(results: list[tuple[str, AbstractEntry]], more: bool) -> str:
+        """
+        Args:
+            results: (base URL, 条目)[]
+            more: 是否还有未列出的结果
+        """
+        reply = "\n\n".join(f"{e.human()}\n{base}{e.url}" for base, e in results)
+        if more:
+            reply += "\n\n……"
+        return reply
+
+    async def choose(
+        keywords: list[str],
+        lookups: Iterable[tuple[str, Awaitable[tuple[list[AbstractEntry], int]]]],
+    ) -> str | None:
+        """按优先级等待各方法的结果，采用首个有结果的
+
+        中日韩文字切出的相邻两字多是“怎么”“如何”之类的常用词，所以若某方法的结果都只命中这些两字、
+        不含任何完整的关键词，则不算有结果，继续看后面的方法。
+        若所有方法都是如此，再采用其中最相关的结果最相关的方法；相同时，靠前的方法优先。
+        """
+        parts = fragments(keywords)
+        whole = [k for k in keywords if k not in parts]
+        normalized = normalize_keywords(keywords)
+
+        def only_fragments(e: AbstractEntry) -> bool:
+            return not any(w in f for w in whole for f in e.keys) and any(
+                p in f for p in parts for f in e.keys
+            )
+
+        fallback: tuple[float, str, list[AbstractEntry], int] | None = None
+        for base, job in lookups:
+            relevant, n_relevant = await job
+            if not relevant:
+                continue
+            if not (parts and all(map(only_fragments, relevant))):
+                return format_reply(
+                    [(base, e) for e in relevant], n_relevant > max_n_results
                 )
-                if len(relevant) > max_n_results:
-                    reply += "\n\n……"
-                return reply
+            # `relevant`从高到低排列
+            best = score(relevant[0], normalized)
+            if fallback is None or best > fallback[0]:
+                fallback = (best, base, relevant, n_relevant)
+
+        if fallback is None:
+            return None
+        _, base, relevant, n_relevant = fallback
+        return format_reply([(base, e) for e in relevant], n_relevant > max_n_results)
+
+    async def handle_sequentially(keywords: list[str]) -> str | None:
+        # Search until first match（生成器只在需要时才调用后面的方法）
+        return await choose(
+            keywords,
+            (
+                (base, lookup(base, search, keywords))
+                for base, search in zip(base_urls, methods)
+            ),
+        )
+
+    async def handle_concurrently(keywords: list[str]) -> str | None:
+        tasks = [
+            (base, asyncio.create_task(lookup(base, search, keywords)))
+            for base, search in zip(base_urls, methods)
+        ]
+        try:
+            # 按优先级等待，所以低优先级方法先完成或出错都不影响结果
+            return await choose(keywords, tasks)
+        finally:
+            pending = [t for _, t in tasks if not t.done()]
+            for t in pending:
+                t.cancel()
+            # 取走被取消或出错的任务的异常，以免未处理的警告
+            await asyncio.gather(*(t for _, t in tasks), return_exceptions=True)
+
+    async def within_budget(base: str, job: Awaitable[T], default: T) -> T:
+        """等待`job`至多`source_timeout`秒；超时或出错则返回`default`"""
+        try:
+            return await asyncio.wait_for(job, timeout=source_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Skipped {base} because it took over {source_timeout} s.")
+        except Exception as error:  # noqa: BLE001 任何来源出错都不应影响其它来源
+            logger.warning(f"Skipped {base} because of {error!r}")
+        return default
+
+    async def handle_merged(keywords: list[str]) -> str | None:
+        results = await asyncio.gather(
+            *(
+                within_budget(base, lookup(base, search, keywords), ([], 0))
+                for base, search in zip(base_urls, methods)
+            )
+        )
+
+        normalized = normalize_keywords(keywords)
+        candidates = sorted(
+            (
+                # 相关程度高者优先；相同时，靠前的方法优先，再保持方法内部的顺序
+                (-score(e, normalized), priority, rank, base, e)
+                for priority, (base, (relevant, _)) in enumerate(
+                    zip(base_urls, results)
+                )
+                for rank, e in enumerate(relevant)
+            ),
+            key=lambda c: c[:3],
+        )
+
+        merged: dict[str, tuple[str, AbstractEntry]] = {}
+        for *_, base, e in candidates:
+            merged.setdefault(f"{base}{e.url}", (base, e))
+        if not merged:
+            return None
+
+        more = len(merged) > max_n_results or any(
+            n_relevant > len(relevant) for relevant, n_relevant in results
+        )
+        return format_reply(list(merged.values())[:max_n_results], more)
+
+    match mode:
+        case "sequential":
+            handle_keywords = handle_sequentially
+        case "concurrent":
+            handle_keywords = handle_concurrently
+        case "merged":
+            handle_keywords = handle_merged
+
+    async def suggest_keywords(keywords: list[str]) -> list[str]:
+        """采用最靠前的方法给出的建议"""
+        if mode == "merged":
+            # 与搜索一样同时调用、限时，否则冷启动时慢的来源仍会拖延回复
+            results = await asyncio.gather(
+                *(
+                    within_budget(base, suggest(base, keywords), [])
+                    for base, suggest in zip(base_urls, suggest_methods or [])
+                )
+            )
+            return next((s for s in results if s), [])
+
+        for base, suggest in zip(base_urls, suggest_methods or []):
+            if suggestions := await suggest(base, keywords):
+                return suggestions
+        return []
+
+    async def search_with_fallback(keywords: list[str]) -> tuple[list[str] | None, str]:
+        """搜索，无结果时尝试纠正拼写
+
+        Returns:
+            (采用的拼写建议, 回复)；若未采用建议，前者为`None`。
+            回复只取决于关键词，可以缓存。
+        """
+        reply = await handle_keywords(keywords)
+        if reply is not None:
+            return None, reply
+
+        # 精确搜索无结果，才尝试纠正拼写
+        if suggestions := await suggest_keywords(keywords):
+            reply = await handle_keywords(suggestions)
+            if reply is not None:
+                return suggestions, reply
+
+        return None, if_no_result
+
+    reply_cache = ReplyCache[tuple[list[str] | None, str]](
+        maxsize=reply_cache_size, ttl=600
+    )
+
+    async def handle(message: str) -> str:
+        keywords = tokenize(message)
+
+        key = reply_cache.make_key(keywords)
+        if (cached := reply_cache.get(key)) is None:
+            since = generation()
+            cached = await search_with_fallback(keywords)
+            reply_cache.put(key, cached, since=since)
 
-        return if_no_result
+        # 提示中引用本次的原话，所以不缓存
+        suggestions, reply = cached
+        if suggestions is None:
+            return reply
+        return "\n".join(
+            [
+                f"未找到“{' '.join(message.split())}”，你是不是要找“{' '.join(suggestions)}”？",
+                "",
+                reply,
+            ]
+        )
 
     return handle
 
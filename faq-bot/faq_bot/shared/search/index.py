@@ -0,0 +1,213 @@
+"""倒排索引
+
+在加载索引时按字符 n-gram 建立一次，此后每次搜索只需检查少数候选条目，不必逐一扫描。
+"""
+
+from collections.abc import Iterable, Iterator
+from copy import copy
+from functools import reduce
+from operator import and_
+from typing import Generic, TypeVar
+
+from .by import AbstractEntry
+from .fuzzy import Vocabulary
+from .tokenize import normalize
+
+T = TypeVar("T", bound=AbstractEntry)
+
+
+def grams(text: str, n: int) -> set[str]:
+    """`text`中长度不超过`n`的全部子串（不含空串）"""
+    return {text[i : i + k] for k in range(1, n + 1) for i in range(len(text) - k + 1)}
+
+
+def to_bits(ids: Iterable[int], size: int) -> int:
+    """将一组序号转换为位图，序号均小于`size`"""
+    buffer = bytearray((size + 7) // 8)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """从低到高列出`mask`中为 1 的位"""
+    # 逐位运算大整数代价太高，转换成字符串再查找更快
+    bits = bin(mask)[:1:-1]
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+class NgramIndex(Generic[T]):
+    """字符 n-gram 倒排索引
+
+    按条目的`keys`建立（子类可覆盖`_fields`改变）。关键词经`normalize`后，若是某一字段的子串，则匹配该条目（子类可覆盖`_mask`、`_lookup`放宽）。
+    `search`按条目在`entries`中的位置列出结果；增量更新后，位置不一定与传入的顺序相同（见`updated`）。
+
+    `entries`中可能有`None`，表示增量更新时删除的条目留下的空位。
+    """
+
+    __slots__ = ("_all", "_postings", "entries", "n", "vocabulary")
+
+    def __init__(self, entries: Iterable[T], *, n: int = 2) -> None:
+        """
+        Args:
+            entries: 全部条目
+            n: gram 的最大长度；考虑到中文词语多为两字，默认为 2
+        """
+        self.n = n
+        self.entries: list[T | None] = list(entries)
+
+        postings: dict[str, list[int]] = {}
+        for id_, e in enumerate(self.entries):
+            assert e is not None
+            for g in self._grams(e):
+                postings.setdefault(g, []).append(id_)
+
+        # 以位图（`int`）存储：第 i 位表示第 i 个条目。
+        # 几千个条目时，比 set 省数倍内存，且求交集、并集都在 C 中完成。
+        size = len(self.entries)
+        self._postings: dict[str, int] = {
+            g: to_bits(ids, size) for g, ids in postings.items()
+        }
+        """gram ↦ 包含它的条目的位图"""
+        self._all = to_bits(
+            (i for i, e in enumerate(self.entries) if e is not None and e.keys), size
+        )
+        """至少有一个匹配字段的条目的位图"""
+
+        self.vocabulary = self._build_vocabulary()
+        """各个匹配字段中的词，用于纠正拼写"""
+
+    def __len__(self) -> int:
+        return len(self.entries) - self.entries.count(None)
+
+    def search(self, keywords: list[str]) -> Iterator[T]:
+        """搜索包含任一关键词的条目"""
+        # 空位不在任何位图中
+        return (self.entries[i] for i in iter_bits(self._mask(keywords)))
+
+    def updated(self, entries: Iterable[T]) -> "NgramIndex[T]":
+        """按新的全部条目更新，返回新索引，本索引不变
+
+        与旧索引中相同的条目保留原来的序号，不必重新索引；只有删除、增加的条目需要修改位图。
+        新条目优先填入删除留下的空位，所以顺序可能与`entries`不同。
+        若改变或空位太多，则直接重建。
+        """
+        new_entries = list(entries)
+
+        old_ids: dict[T, list[int]] = {}
+        for id_, e in enumerate(self.entries):
+            if e is not None:
+                old_ids.setdefault(e, []).append(id_)
+
+        added: list[T] = []
+        for e in new_entries:
+            if same := old_ids.get(e):
+                same.pop()
+            else:
+                added.append(e)
+        removed = sorted(id_ for same in old_ids.values() for id_ in same)
+
+        n_holes = self.entries.count(None) + len(removed) - len(added)
+        if (
+            len(added) + len(removed) > len(new_entries) // 2
+            or n_holes > len(new_entries) // 4
+        ):
+            return type(self)(new_entries, n=self.n)
+
+        index = copy(self)
+        index.entries = self.entries.copy()
+        index._postings = self._postings.copy()
+        # `old_ids`中剩下的即删除的条目
+        index.vocabulary = self.vocabulary.updated(
+            (k for e in added for k in e.keys),
+            (k for e, same in old_ids.items() for _ in same for k in e.keys),
+        )
+        for id_ in removed:
+            index._remove(id_)
+
+        free = [id_ for id_, e in enumerate(index.entries) if e is None]
+        free.extend(range(len(index.entries), len(index.entries) + len(added)))
+        for id_, e in zip(free, added):
+            index._add(id_, e)
+
+        return index
+
+    def _build_vocabulary(self) -> Vocabulary:
+        return Vocabulary(k for e in self.entries if e is not None for k in e.keys)
+
+    def _fields(self, entry: T) -> Iterable[str]:
+        """用于匹配的各个字段，已`normalize`"""
+        return entry.keys
+
+    def _grams(self, entry: T) -> set[str]:
+        return set().union(*(grams(k, self.n) for k in self._fields(entry)))
+
+    def _remove(self, id_: int) -> None:
+        """从位图中删除条目，留下空位"""
+        entry = self.entries[id_]
+        assert entry is not None
+        mask = ~(1 << id_)
+        for g in self._grams(entry):
+            if posting := self._postings[g] & mask:
+                self._postings[g] = posting
+            else:
+                del self._postings[g]
+        self._all &= mask
+        self.entries[id_] = None
+
+    def _add(self, id_: int, entry: T) -> None:
+        """将条目加入空位或末尾"""
+        if id_ == len(self.entries):
+            self.entries.append(entry)
+        else:
+            assert self.entries[id_] is None
+            self.entries[id_] = entry
+        bit = 1 << id_
+        for g in self._grams(entry):
+            self._postings[g] = self._postings.get(g, 0) | bit
+        if entry.keys:
+            self._all |= bit
+
+    def _mask(self, keywords: list[str]) -> int:
+        """包含任一关键词的条目的位图"""
+        mask = 0
+        for key in keywords:
+            mask |= self._lookup(normalize(key))
+        return mask
+
+    def _lookup(self, key: str) -> int:
+        """搜索包含`key`的条目，`key`已`normalize`"""
+        if not key:
+            # 空串包含于任何文档
+            return self._all
+
+        if len(key) <= self.n:
+            # `key`本身就是 gram，无需验证
+            return self._postings.get(key, 0)
+
+        # 候选条目必须包含`key`的全部 n-gram，但包含全部 n-gram 不一定包含`key`，还需验证
+        candidates = reduce(
+            and_,
+            (
+                self._postings.get(key[i : i + self.n], 0)
+                for i in range(len(key) - self.n + 1)
+            ),
+        )
+        return to_bits(
+            (
+                i
+                for i in iter_bits(candidates)
+                if any(key in k for k in self._fields(self.entries[i]))
+            ),
+            len(self.entries),
+        )
+
+
+def build_index(entries: Iterable[T], previous: NgramIndex[T] | None) -> NgramIndex[T]:
+    """建立索引；若有旧索引，则在其基础上增量更新"""
+    if previous is None:
+        return NgramIndex(entries)
+    return previous.updated(entries)
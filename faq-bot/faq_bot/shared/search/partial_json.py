@@ -0,0 +1,81 @@
+"""只解析 JSON 中需要的字段
+
+网站的索引文件往往包含我们用不到的大块内容（例如 mdBook 的倒排索引），
+`json.loads`会把它们全部转换为 Python 对象，内存占用可达原文的数倍。
+这里逐个读取对象的键，需要的值交给`json`解析；其余的也由`json`扫描，但其中的对象随即丢弃，不会累积。
+"""
+
+import json
+import re
+from typing import Final, TypeAlias
+
+Spec: TypeAlias = "dict[str, Spec | json.JSONDecoder | bool]"
+"""需要的字段：键 ↦ `True`（完整解析）、嵌套的`Spec`（只解析其中的部分字段）或解析该值所用的`JSONDecoder`
+
+自定义`JSONDecoder`的`object_pairs_hook`可在解析时就把大块内容转换为更紧凑的形式。
+
+键`"*"`匹配其余所有键，用于以序号为键的对象。
+"""
+
+_decoder: Final = json.JSONDecoder()
+_skipper: Final = json.JSONDecoder(object_pairs_hook=lambda pairs: None)
+"""跳过不需要的值：对象在解析后立即丢弃，只剩下由`None`组成的数组"""
+_WHITESPACE: Final = re.compile(r"[ \t\n\r]*")
+
+
+def loads(text: str, spec: Spec, start: int = 0) -> dict:
+    """从`text[start:]`开始解析一个 JSON 对象，只保留`spec`中的字段
+
+    `spec`中的字段若不存在则略去，不报错。对象之后的内容（如 JS 代码）忽略。
+
+    Raises:
+        json.JSONDecodeError: 不是有效的 JSON
+    """
+    value, _ = _parse_object(text, spec, _skip_whitespace(text, start))
+    return value
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _expect(text: str, pos: int, char: str) -> int:
+    if not text.startswith(char, pos):
+        raise json.JSONDecodeError(f"Expecting {char!r}", text, pos)
+    return _skip_whitespace(text, pos + 1)
+
+
+def _parse_object(text: str, spec: Spec, pos: int) -> tuple[dict, int]:
+    """解析从`pos`开始的对象，返回 (对象, 结尾位置)"""
+    pos = _expect(text, pos, "{")
+    result: dict = {}
+    if text.startswith("}", pos):
+        return result, pos + 1
+
+    while True:
+        # 不能用`_expect`，它会跳过引号后的空白，改变键
+        if not text.startswith('"', pos):
+            raise json.JSONDecodeError("Expecting '\"'", text, pos)
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = _expect(text, _skip_whitespace(text, pos), ":")
+
+        match spec.get(key, spec.get("*")):
+            case True:
+                result[key], pos = _decoder.raw_decode(text, pos)
+            case dict() as sub_spec:
+                result[key], pos = _parse_object(text, sub_spec, pos)
+            case json.JSONDecoder() as decoder:
+                result[key], pos = decoder.raw_decode(text, pos)
+            case _:
+                pos = _skip_value(text, pos)
+
+        pos = _skip_whitespace(text, pos)
+        if text.startswith("}", pos):
+            return result, pos + 1
+        pos = _expect(text, pos, ",")
+
+
+def _skip_value(text: str, pos: int) -> int:
+    """跳过从`pos`开始的值，返回其结尾位置"""
+    _, end = _skipper.raw_decode(text, pos)
+    return end
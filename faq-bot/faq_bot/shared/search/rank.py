@@ -0,0 +1,54 @@
+"""按相关程度排序搜索结果"""
+
+from collections.abc import Iterable
+from heapq import nlargest
+from typing import TypeVar
+
+from .by import AbstractEntry
+from .tokenize import normalize
+
+T = TypeVar("T", bound=AbstractEntry)
+
+
+def normalize_keywords(keywords: Iterable[str]) -> list[str]:
+    """`normalize`并去重，保持顺序"""
+    return list(dict.fromkeys(map(normalize, keywords)))
+
+
+def score(entry: AbstractEntry, keywords: list[str]) -> float:
+    """相关程度，介于 0 到 1，越大越相关
+
+    Args:
+        entry: 条目
+        keywords: 已经`normalize_keywords`的关键词
+
+    依次考虑：标题与某一关键词完全相同，标题以某一关键词开头，命中的关键词比例，标题层级。
+    """
+    title = entry.keys[0]
+    exact = any(k == title for k in keywords)
+    prefix = any(title.startswith(k) for k in keywords)
+    hits = sum(any(k in f for f in entry.keys) for k in keywords)
+    coverage = hits / len(keywords) if keywords else 0
+    return 0.4 * exact + 0.2 * prefix + 0.3 * coverage + 0.1 / (1 + entry.depth)
+
+
+def top_k(entries: Iterable[T], keywords: list[str], k: int) -> tuple[list[T], int]:
+    """选出最相关的`k`个条目
+
+    用堆选取，复杂度为 O(n log k)，且不必先将`entries`全部列出。
+    相关程度相同时，保持`entries`中的先后顺序。
+
+    Returns:
+        (最相关的至多`k`个条目，从高到低排列；`entries`的总数)
+    """
+    keywords = normalize_keywords(keywords)
+    total = 0
+
+    def counted() -> Iterable[T]:
+        nonlocal total
+        for e in entries:
+            total += 1
+            yield e
+
+    ranked = nlargest(k, counted(), key=lambda e: score(e, keywords))
+    return ranked, total
@@ -0,0 +1,92 @@
+"""搜索回复的缓存
+
+群聊中常反复搜索相同的关键词，直接复用上次的回复，不必再搜索、排序。
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Generic, NamedTuple, TypeVar
+
+from nonebot import logger
+
+from ..cache import generation
+from .rank import normalize_keywords
+
+R = TypeVar("R")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ReplyCache(Generic[R]):
+    """回复的 LRU 缓存
+
+    只应缓存仅取决于关键词的内容；因人而异的部分（如引用用户原话）应在取出后再补充。
+
+    键为规范化、去重、排序后的关键词，所以关键词的顺序、大小写、全角半角不影响命中。
+    任一搜索索引更新后（`cache.generation`改变），全部清空；其它缓存（如 Typst Universe 的示例）不影响。
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float, report_every: int = 100) -> None:
+        """
+        Args:
+            maxsize: 最多缓存多少条回复
+            ttl: 回复的有效期（秒）。命中缓存时不会调用搜索方法，也就不会触发索引的后台刷新，所以需要过期。
+            report_every: 每查询多少次，记录一次命中率
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.report_every = report_every
+        self.hits = 0
+        self.misses = 0
+
+        self._replies: OrderedDict[tuple[str, ...], tuple[R, float]] = OrderedDict()
+        """关键词 ↦ (回复, 缓存时刻)"""
+        self._generation = generation()
+
+    @staticmethod
+    def make_key(keywords: Iterable[str]) -> tuple[str, ...]:
+        return tuple(sorted(normalize_keywords(keywords)))
+
+    def get(self, key: tuple[str, ...]) -> R | None:
+        """查询回复；若未缓存，返回`None`"""
+        if self._generation != generation():
+            self._replies.clear()
+            self._generation = generation()
+
+        cached = self._replies.get(key)
+        if cached is not None and time.monotonic() - cached[1] > self.ttl:
+            del self._replies[key]
+            cached = None
+
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._replies.move_to_end(key)
+
+        if (self.hits + self.misses) % self.report_every == 0:
+            logger.info(f"Reply cache: {self.info()}")
+
+        return cached[0] if cached is not None else None
+
+    def put(self, key: tuple[str, ...], reply: R, *, since: int) -> None:
+        """缓存回复
+
+        Args:
+            since: 开始搜索前的`cache.generation()`；若搜索期间索引已更新，则不缓存
+        """
+        if since != generation() or self.maxsize <= 0:
+            return
+        self._replies[key] = (reply, time.monotonic())
+        self._replies.move_to_end(key)
+        if len(self._replies) > self.maxsize:
+            self._replies.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._replies))
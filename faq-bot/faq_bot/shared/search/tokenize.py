@@ -0,0 +1,61 @@
+"""切分、规范化关键词
+
+中文、日文、朝鲜文不用空格分词，例如“生僻字怎么办”整体作为关键词时，匹配不到标题“生僻字”。
+这里不依赖词典，把这类文字切成相邻两字（bigram），正好对应`NgramIndex`中预先建立的 2-gram。
+"""
+
+import re
+import unicodedata
+from typing import Final
+
+_CJK: Final = re.compile(
+    "["
+    "\u3040-\u30ff"  # 平假名、片假名
+    "\u3400-\u4dbf"  # 中日韩统一表意文字扩展 A
+    "\u4e00-\u9fff"  # 中日韩统一表意文字
+    "\uac00-\ud7af"  # 谚文音节
+    "\uf900-\ufaff"  # 中日韩兼容表意文字
+    "]+"
+)
+
+
+def normalize(text: str) -> str:
+    """NFKC 规范化并 casefold
+
+    统一全角、半角（如`ｔａｂｌｅ`与`table`、`（`与`(`）和大小写。条目的`keys`和关键词都应如此处理。
+    """
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def tokenize(message: str) -> list[str]:
+    """将消息切分为关键词，已`normalize`
+
+    先按空白切分，再将其中的中日韩文字与其它文字分开，并丢弃只含标点的部分（如问句末尾的`？`）。
+    超过两字的中日韩文字，除保留整体外，再切成相邻两字，例如`生僻字怎么办` ↦ `生僻字怎么办 生僻 僻字 字怎 怎么 么办`。
+    保留整体是为了在排序时仍能识别完全相同、以关键词开头的标题。
+    """
+    keywords: list[str] = []
+    for word in normalize(message).split():
+        start = 0
+        for m in _CJK.finditer(word):
+            keywords.append(word[start : m.start()])
+            keywords.extend(cjk_bigrams(m.group()))
+            start = m.end()
+        keywords.append(word[start:])
+    return list(dict.fromkeys(k for k in keywords if any(c.isalnum() for c in k)))
+
+
+def cjk_bigrams(run: str) -> list[str]:
+    """切分连续的中日韩文字"""
+    if len(run) <= 2:
+        return [run]
+    return [run, *(run[i : i + 2] for i in range(len(run) - 1))]
+
+
+def fragments(keywords: list[str]) -> set[str]:
+    """`tokenize`从较长的中日韩文字中切出的相邻两字
+
+    它们多是“怎么”“如何”“设置”之类的常用词，只命中它们的条目往往并不相关。
+    """
+    runs = [k for k in keywords if len(k) > 2 and _CJK.fullmatch(k)]
+    return {k for k in keywords if len(k) == 2 and any(k in r for r in runs)}
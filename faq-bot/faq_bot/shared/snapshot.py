@@ -0,0 +1,97 @@
+"""缓存值在磁盘上的快照
+
+重启后可从快照恢复已解析的索引，不必等待网络。
+
+文件格式：
+- 魔数`FAQBOT-SNAPSHOT`
+- 格式版本（1 字节）、快照版本（2 字节，大端）
+- 保存时刻（8 字节，大端 double，Unix 时间戳）
+- 其余为 zlib 压缩的 pickle，内容为`(key, value, validators)`，`validators`用于条件请求
+
+快照只由本程序写入本地目录，所以可以使用 pickle。
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+import time
+import zlib
+from collections.abc import Hashable
+from pathlib import Path
+from typing import Final, Generic, TypeVar
+
+from nonebot import logger
+
+from .http import Validators
+
+R = TypeVar("R")
+
+SNAPSHOT_DIR: Final = Path(os.environ.get("FAQ_BOT_SNAPSHOT_DIR", ".cache/faq-bot"))
+"""快照所在目录，可用环境变量`$FAQ_BOT_SNAPSHOT_DIR`设置"""
+
+_MAGIC: Final = b"FAQBOT-SNAPSHOT"
+_FORMAT_VERSION: Final = 2
+_HEADER: Final = struct.Struct(f">{len(_MAGIC)}sBHd")
+
+
+class Snapshot(Generic[R]):
+    """一组快照，每个缓存键对应一个文件"""
+
+    def __init__(self, name: str, *, version: int) -> None:
+        """
+        Args:
+            name: 名称，用作目录名
+            version: 快照版本；值的结构改变时应递增，旧快照会被忽略
+        """
+        self.name = name
+        self.version = version
+
+    def path(self, key: Hashable) -> Path:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+        return SNAPSHOT_DIR / self.name / f"{digest}.bin"
+
+    def load(self, key: Hashable) -> tuple[R, float, Validators] | None:
+        """读取快照
+
+        Returns:
+            (值, 保存时刻的 Unix 时间戳, 获取值时记录的 ETag 等)；若没有可用的快照，返回`None`
+        """
+        path = self.path(key)
+        try:
+            raw = path.read_bytes()
+            magic, format_version, version, saved_at = _HEADER.unpack_from(raw)
+            if (magic, format_version, version) != (
+                _MAGIC,
+                _FORMAT_VERSION,
+                self.version,
+            ):
+                logger.info(f"Ignored the outdated snapshot {path}.")
+                return None
+            saved_key, value, validators = pickle.loads(
+                zlib.decompress(raw[_HEADER.size :])
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as error:  # noqa: BLE001 反序列化可能抛出各种异常
+            logger.warning(f"Ignored the broken snapshot {path}: {error!r}")
+            return None
+
+        if saved_key != key:
+            # 哈希冲突
+            return None
+        return value, saved_at, validators
+
+    def save(self, key: Hashable, value: R, validators: Validators) -> None:
+        """保存快照（原子地替换旧快照）"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.version, time.time())
+        payload = zlib.compress(
+            pickle.dumps((key, value, validators), protocol=pickle.HIGHEST_PROTOCOL),
+            level=1,
+        )
+        temp = path.with_suffix(".tmp")
+        temp.write_bytes(header + payload)
+        temp.replace(path)
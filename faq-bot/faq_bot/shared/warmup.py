@@ -0,0 +1,60 @@
+"""启动时预先加载
+
+否则重启后，各个索引要等到首次使用时才加载，第一位用户要等很久。
+在后台同时加载，不会推迟 NoneBot 启动；个别来源失败也只记录警告。
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from nonebot import get_driver, logger
+
+_loaders: dict[str, Callable[[], Awaitable[object]]] = {}
+"""名称 ↦ 加载函数"""
+
+_task: asyncio.Task[None] | None = None
+
+
+def register(name: str, load: Callable[[], Awaitable[object]]) -> None:
+    """登记需要预先加载的内容；同名的只加载一次"""
+    _loaders.setdefault(name, load)
+
+
+async def warm_up() -> None:
+    """同时加载所有登记的内容，并记录耗时"""
+
+    async def run(name: str, load: Callable[[], Awaitable[object]]) -> bool:
+        start = time.perf_counter()
+        try:
+            await load()
+        except Exception as error:  # noqa: BLE001 预先加载失败不影响启动
+            logger.warning(
+                f"Failed to warm up {name} after {time.perf_counter() - start:.1f} s: {error!r}"
+            )
+            return False
+        logger.info(f"Warmed up {name} in {time.perf_counter() - start:.1f} s.")
+        return True
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(n, load) for n, load in _loaders.items()))
+    logger.info(
+        f"Warmed up {sum(results)}/{len(results)} sources "
+        f"in {time.perf_counter() - start:.1f} s."
+    )
+
+
+async def start_warm_up() -> None:
+    """在后台开始预先加载"""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(warm_up())
+
+
+try:
+    driver = get_driver()
+except ValueError:
+    # 未初始化 NoneBot，例如在脚本中使用，此时不预先加载
+    pass
+else:
+    driver.on_startup(start_warm_up)